@@ -0,0 +1,134 @@
+__import__('pysqlite3')
+import sys
+sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+
+import argparse
+import glob
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from formatter import write_srs
+
+logger = logging.getLogger("batch")
+
+BRD_EXTENSIONS = (".txt", ".pdf")
+
+
+def find_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in sorted(os.listdir(pattern))]
+        else:
+            candidates = sorted(glob.glob(pattern, recursive=True))
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(BRD_EXTENSIONS) and path not in paths:
+                paths.append(path)
+    return paths
+
+
+def output_path(path, output_dir):
+    return os.path.join(output_dir, f"{os.path.splitext(os.path.basename(path))[0]}.md")
+
+
+def convert(path, destination, pipeline, templates, cache, args):
+    with open(path, "rb") as f:
+        data = f.read()
+
+    started = time.perf_counter()
+    output = pipeline.run_pipeline(
+        templates,
+        data,
+        os.path.basename(path),
+        args.topic,
+        cache,
+        concurrency=args.concurrency,
+        bypass_cache=args.bypass_cache,
+        session_id=path,
+        output_path=None,
+    )
+
+    # Written next to the final name and renamed, so an interrupted run never leaves a file that looks finished
+    write_srs(output.raw, destination)
+    return time.perf_counter() - started
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a batch of BRDs into SRS documents.")
+    parser.add_argument("inputs", nargs="+", help="BRD files, directories or glob patterns (txt or pdf)")
+    parser.add_argument("-o", "--output-dir", default="srs", help="where to write one SRS per input (default: srs)")
+    parser.add_argument("-j", "--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "2")),
+                        help="number of BRDs converted at the same time")
+    parser.add_argument("--rpm", type=float, default=float(os.getenv("LLM_RPM", "0")),
+                        help="global cap on LLM requests per minute across all workers (0 disables it)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("ANALYSIS_CONCURRENCY", "3")),
+                        help="parallel analysis tasks inside each conversion")
+    parser.add_argument("--topic", default="", help="topic passed to every crew")
+    parser.add_argument("--bypass-cache", action="store_true", help="ignore cached task outputs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        logger.error("No .txt or .pdf files matched %s", " ".join(args.inputs))
+        return 1
+
+    destinations = {path: output_path(path, args.output_dir) for path in inputs}
+    if len(set(destinations.values())) != len(destinations):
+        logger.error("Several inputs share a file name and would overwrite each other's SRS")
+        return 1
+
+    # Resume: anything that already has its SRS was finished by an earlier run
+    pending = [path for path in inputs if not os.path.exists(destinations[path])]
+    logger.info("%d BRDs found, %d already converted, %d to go", len(inputs), len(inputs) - len(pending), len(pending))
+    if not pending:
+        return 0
+
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    import pipeline
+    from cache import ResultCache
+    from llms import LLM_MAX_CONCURRENCY, RateLimiter
+
+    templates = pipeline.build_templates(limiter=RateLimiter(args.rpm, LLM_MAX_CONCURRENCY))
+    cache = ResultCache()
+
+    failures = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {
+            pool.submit(convert, path, destinations[path], pipeline, templates, cache, args): path
+            for path in pending
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                elapsed = future.result()
+            except Exception:
+                failures += 1
+                logger.exception("Failed to convert %s", path)
+                continue
+            logger.info("Converted %s -> %s in %.1fs", path, destinations[path], elapsed)
+
+    logger.info(
+        "Converted %d of %d BRDs in %.1fs",
+        len(pending) - failures,
+        len(pending),
+        time.perf_counter() - started,
+    )
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
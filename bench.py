@@ -0,0 +1,243 @@
+__import__('pysqlite3')
+import sys
+sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+
+import argparse
+import atexit
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# Everything below must stay on this machine: no telemetry, no crew chatter, no shared logs
+_workdir = tempfile.mkdtemp(prefix="srs-bench-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ["OTEL_SDK_DISABLED"] = "true"
+# litellm otherwise downloads its model price map when it is imported
+os.environ["LITELLM_LOCAL_MODEL_COST_MAP"] = "True"
+os.environ["CREW_VERBOSE"] = "false"
+os.environ["METRICS_LOG"] = os.path.join(_workdir, "metrics.jsonl")
+os.environ["SRS_OUTPUT_PATH"] = os.path.join(_workdir, "srs1.md")
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+from crewai import LLM
+from crewai.utilities.events import LLMCallCompletedEvent, LLMCallStartedEvent, crewai_event_bus
+from crewai.utilities.events.llm_events import LLMCallType
+
+import pipeline
+from cache import ResultCache
+
+STAGES = ("business_analysis", "technical_analysis", "requirement_categorization", "srs_draft", "srs_format")
+
+SECTIONS = (
+    "Introduction", "Purpose", "Scope", "In Scope", "Out of Scope", "Assumptions", "References",
+    "Overview", "Data Model", "User Characteristics", "Codification Schemes", "Dependencies",
+    "Functional Requirements", "Non-Functional Requirements", "Technical Requirements",
+)
+
+WORDS = (
+    "system", "user", "order", "invoice", "account", "report", "shall", "must", "data", "record",
+    "approval", "workflow", "integration", "service", "customer", "payment", "audit", "access",
+    "schedule", "notification", "export", "dashboard", "latency", "availability", "role",
+)
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def synthetic_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def synthetic_brd(words, seed=0):
+    # Same seed and size always produce the same document
+    rng = random.Random(seed * 1_000_003 + words)
+    per_section = max(words // len(SECTIONS), 5)
+    parts = ["Business Requirements Document"]
+    for number, section in enumerate(SECTIONS, start=1):
+        parts.append(f"{number}. {section}")
+        for start in range(0, per_section, 60):
+            parts.append(synthetic_text(rng, min(60, per_section - start)).capitalize() + ".")
+    return "\n".join(parts)
+
+
+def canned_answer(completion_tokens):
+    # A deterministic Markdown SRS-shaped answer of roughly the requested size
+    rng = random.Random(completion_tokens)
+    per_section = max(completion_tokens * 3 // 4 // len(SECTIONS), 1)
+    body = "\n\n".join(
+        f"## {section}\n{synthetic_text(rng, per_section).capitalize()}." for section in SECTIONS
+    )
+    return f"{body}\n\n## Conclusion\n{synthetic_text(rng, per_section).capitalize()}."
+
+
+class FakeLLM(LLM):
+    # Stand-in for the real model: sleeps for a fixed latency and returns a canned final answer
+    def __init__(self, latency, completion_tokens):
+        super().__init__(model="openai/srs-bench-fake")
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.answer = f"Thought: I now can give a great answer\nFinal Answer: {canned_answer(completion_tokens)}"
+
+        # Agents get shallow copies of their LLM, so the counters live in a shared dict
+        self.stats = {"calls": 0, "llm_time": 0.0}
+        self._lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        crewai_event_bus.emit(self, LLMCallStartedEvent(messages=messages, tools=tools))
+        started = time.perf_counter()
+        time.sleep(self.latency)
+
+        # Report usage the way LLM.call does, so crew usage metrics stay meaningful
+        prompt = messages if isinstance(messages, str) else "\n".join(m["content"] for m in messages)
+        usage = SimpleNamespace(
+            prompt_tokens=estimate_tokens(prompt),
+            completion_tokens=self.completion_tokens,
+            total_tokens=estimate_tokens(prompt) + self.completion_tokens,
+            prompt_tokens_details=None,
+        )
+        for callback in callbacks or []:
+            if hasattr(callback, "log_success_event"):
+                callback.log_success_event(kwargs={}, response_obj={"usage": usage}, start_time=0, end_time=0)
+
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["llm_time"] += time.perf_counter() - started
+        crewai_event_bus.emit(self, LLMCallCompletedEvent(response=self.answer, call_type=LLMCallType.LLM_CALL))
+        return self.answer
+
+
+class Collector:
+    # Queue-like sink for run_pipeline events; only the final metrics matter here
+    def __init__(self):
+        self.task_metrics = []
+
+    def put(self, event):
+        kind, _, payload = event
+        if kind == "metrics":
+            self.task_metrics = json.loads(payload)
+
+
+def run_once(templates, cache, brd, name, latency):
+    collector = Collector()
+    started = time.perf_counter()
+    pipeline.run_pipeline(
+        templates,
+        brd.encode("utf-8"),
+        name,
+        "benchmark",
+        cache,
+        bypass_cache=True,
+        events=collector,
+        session_id=name,
+    )
+    wall = time.perf_counter() - started
+
+    # Chunked analyses report one entry per chunk; they run side by side, so wall time is the slowest one
+    stages = {}
+    for metrics in collector.task_metrics:
+        stage = stages.setdefault(metrics["task"], {"wall_time": 0.0, "llm_calls": 0, "prompt_tokens": 0, "overhead": 0.0})
+        stage["wall_time"] = max(stage["wall_time"], metrics["wall_time"])
+        stage["llm_calls"] += metrics["llm_calls"]
+        stage["prompt_tokens"] += metrics["prompt_tokens"]
+        stage["overhead"] = max(stage["overhead"], round(metrics["wall_time"] - metrics["llm_calls"] * latency, 4))
+    return wall, stages
+
+
+def benchmark(sizes, concurrencies, latency, completion_tokens, repeat):
+    llm = FakeLLM(latency, completion_tokens)
+    templates = pipeline.build_templates(llm=llm)
+    cache = ResultCache(path=os.path.join(_workdir, "results.sqlite3"))
+    results = []
+
+    for words in sizes:
+        brd = synthetic_brd(words)
+        for concurrency in concurrencies:
+            for attempt in range(repeat):
+                calls_before, llm_time_before = llm.stats["calls"], llm.stats["llm_time"]
+                tracemalloc.start()
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    runs = list(pool.map(
+                        lambda i: run_once(templates, cache, brd, f"brd-{words}-{i}.txt", latency),
+                        range(concurrency),
+                    ))
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                stage_rows = {
+                    stage: {
+                        key: round(sum(stages[stage][key] for _, stages in runs) / len(runs), 4)
+                        for key in ("wall_time", "llm_calls", "prompt_tokens", "overhead")
+                    }
+                    for stage in STAGES
+                    if all(stage in stages for _, stages in runs)
+                }
+                pipeline_wall = sum(wall for wall, _ in runs) / len(runs)
+                results.append({
+                    "brd_words": words,
+                    "brd_tokens": estimate_tokens(brd),
+                    "concurrency": concurrency,
+                    "attempt": attempt,
+                    "elapsed": round(elapsed, 4),
+                    "pipeline_wall": round(pipeline_wall, 4),
+                    "throughput_per_min": round(60 * concurrency / elapsed, 2),
+                    "llm_calls": llm.stats["calls"] - calls_before,
+                    "llm_time": round(llm.stats["llm_time"] - llm_time_before, 4),
+                    "python_peak_mb": round(peak / 2**20, 2),
+                    "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+                    "stages": stage_rows,
+                })
+    return results
+
+
+def print_report(results):
+    header = f"{'words':>7} {'conc':>4} {'elapsed':>8} {'pipeline':>9} {'docs/min':>9} {'calls':>6} {'peak MB':>8} {'rss MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['brd_words']:>7} {row['concurrency']:>4} {row['elapsed']:>8.3f} {row['pipeline_wall']:>9.3f} "
+            f"{row['throughput_per_min']:>9.2f} {row['llm_calls']:>6} {row['python_peak_mb']:>8.2f} {row['max_rss_mb']:>8.2f}"
+        )
+        for stage, stats in row["stages"].items():
+            print(
+                f"{'':>13}{stage:<28} wall {stats['wall_time']:>7.3f}s  overhead {stats['overhead']:>7.3f}s  "
+                f"calls {stats['llm_calls']:>4.1f}  prompt tokens {stats['prompt_tokens']:>8.0f}"
+            )
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SRS crew offline against a fake LLM.")
+    parser.add_argument("--sizes", type=parse_list, default=[1000, 5000, 20000], help="BRD sizes in words")
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 2, 4], help="concurrent pipeline runs")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the fake LLM takes per call")
+    parser.add_argument("--completion-tokens", type=int, default=400, help="size of every fake answer")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size and concurrency")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args(argv)
+
+    json_path = args.json
+    results = benchmark(args.sizes, args.concurrency, args.latency, args.completion_tokens, args.repeat)
+    print_report(results)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Where task outputs are kept between runs and how much of it we keep
+CACHE_PATH = os.getenv("RESULT_CACHE_PATH", os.path.join("cache", "results.sqlite3"))
+CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+CACHE_MAX_AGE = int(os.getenv("RESULT_CACHE_MAX_AGE", str(7 * 24 * 60 * 60)))
+
+
+def content_digest(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def task_key(task, inputs=None):
+    # Everything that can change what the agent would write for this task. The BRD only counts
+    # through the slice in the inputs, so a revision that leaves a task's sections alone reuses it
+    agent = task.agent
+    parts = {
+        "description": task.description,
+        "expected_output": task.expected_output,
+        "role": agent.role,
+        "model": getattr(agent.llm, "model", str(agent.llm)),
+        # The output budget; a larger one can give a longer answer
+        "max_tokens": getattr(agent.llm, "max_tokens", None),
+        "inputs": inputs or {},
+        "context": [t.output.raw for t in task.context or [] if t.output is not None],
+    }
+    return content_digest(json.dumps(parts, sort_keys=True))
+
+
+class ResultCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, output TEXT NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            # Section digests of the last version of each BRD, to tell what a re-upload changed
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS revisions ("
+                "name TEXT PRIMARY KEY, sections TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT output FROM results WHERE key = ? AND created >= ?",
+                (key, now - self.max_age),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key, output):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, output, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, output, now, now),
+            )
+        self.evict()
+
+    def get_revision(self, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sections FROM revisions WHERE name = ? AND updated >= ?",
+                (name, time.time() - self.max_age),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put_revision(self, name, sections):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO revisions (name, sections, updated) VALUES (?, ?, ?)",
+                (name, json.dumps(sections), time.time()),
+            )
+
+    def evict(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM results WHERE created < ?", (time.time() - self.max_age,))
+            self._conn.execute("DELETE FROM revisions WHERE updated < ?", (time.time() - self.max_age,))
+
+            # Drop the least recently used entries once the cache outgrows its budget
+            rows = self._conn.execute(
+                "SELECT key, length(output) FROM results ORDER BY accessed DESC"
+            ).fetchall()
+            total = 0
+            stale = []
+            for key, size in rows:
+                total += size
+                if total > self.max_bytes:
+                    stale.append((key,))
+            self._conn.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM results")
+            self._conn.execute("DELETE FROM revisions")
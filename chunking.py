@@ -0,0 +1,147 @@
+import os
+import re
+
+from cache import content_digest
+from ingest import canonical_section
+
+# Map-reduce mode for BRD slices too large for one prompt: chunk size (0 means the task's input budget),
+# how much consecutive chunks share, and how many condense rounds the reduce step may take.
+# Chunks run on the analysis pool, so the analysis concurrency setting caps them as well
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "0"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "200"))
+CONDENSE_ROUNDS = int(os.getenv("CONDENSE_ROUNDS", "3"))
+
+_LIST_ITEM = re.compile(r"^\s*(-|\*|\+|\d+[.)])\s+")
+_HEADING = re.compile(r"^(?P<level>#{1,6})\s+(?P<title>.+?)\s*#*$")
+_NUMBERING = re.compile(r"^(\d+(\.\d+)*\.?|[IVX]+\.)\s+")
+
+
+def _anchor(line, size):
+    # Where a chunk may end early: before any heading, and before a line whose own hash picks it,
+    # about once every half chunk. The choice depends on the line alone, so an edit only moves the
+    # cuts next to it and a revised BRD keeps the rest of its chunks, and their cached results
+    if line.startswith("#"):
+        return True
+    words = " ".join(line.split())
+    spacing = max(size // 2 // (len(words) + 1), 1)
+    return bool(words) and int(content_digest(words)[:8], 16) % spacing == 0
+
+
+def split_chunks(text, size, overlap=0):
+    # Chunks of at most `size` characters cut at line breaks. Each one repeats the tail of the
+    # previous chunk and the heading of the section it continues, so no passage loses its context
+    text = text.strip()
+    if len(text) <= size:
+        return [text] if text else []
+    overlap = min(overlap, size // 4)
+    pieces = []
+    for line in text.splitlines():
+        pieces += [line[i:i + size] for i in range(0, len(line), size)] or [""]
+
+    chunks = []
+    current = []
+    length = 0
+    start = 0
+    heading = None
+    for piece in pieces:
+        full = length + len(piece) + 1 > size
+        if current and (full or length - start >= size // 4 and _anchor(piece, size)):
+            chunks.append("\n".join(current).strip())
+            tail = []
+            tail_length = 0
+            for line in reversed(current):
+                if tail_length + len(line) + 1 > overlap:
+                    break
+                tail.insert(0, line)
+                tail_length += len(line) + 1
+            if heading and not any(line.startswith("#") for line in tail):
+                tail.insert(0, heading)
+            current = tail
+            length = start = sum(len(line) + 1 for line in current)
+        current.append(piece)
+        length += len(piece) + 1
+        if piece.startswith("#"):
+            heading = piece
+    if "\n".join(current).strip():
+        chunks.append("\n".join(current).strip())
+    return chunks
+
+
+def _key(text):
+    return " ".join(text.lower().split())
+
+
+def _output_sections(text):
+    # (title, body) pairs of one partial output. Its sections are the '##' headings, or the '#' ones
+    # when it has no '##'; a '#' above '##' sections is a document title and dropped. Unlike
+    # parse_sections, a lone '##' is still a section: a chunk often covers just one
+    lines = text.strip().splitlines()
+    levels = {len(m.group("level")) for m in map(_HEADING.match, lines) if m}
+    level = 2 if 2 in levels else 1 if 1 in levels else None
+
+    sections = []
+    title, body = None, []
+    for line in lines:
+        match = _HEADING.match(line)
+        if match and len(match.group("level")) < level:
+            continue
+        if match and len(match.group("level")) == level:
+            if title is not None or "\n".join(body).strip():
+                sections.append((title, "\n".join(body).strip()))
+            title, body = _NUMBERING.sub("", match.group("title").strip("*_: ")), []
+            continue
+        body.append(line)
+    sections.append((title, "\n".join(body).strip()))
+    return sections
+
+
+def _subsections(body):
+    # A section's text split at its own sub-headings, as (heading line, text) pairs
+    parts = []
+    heading, lines = None, []
+    for line in body.splitlines():
+        if _HEADING.match(line):
+            parts.append((heading, "\n".join(lines)))
+            heading, lines = line.strip(), []
+        else:
+            lines.append(line)
+    parts.append((heading, "\n".join(lines)))
+    return parts
+
+
+def merge_outputs(outputs):
+    # Reduce step: one section per heading and one sub-section per sub-heading in first-seen order,
+    # with paragraphs and list items that several chunks produced (mostly from the overlaps) kept once
+    merged = {}
+    for output in outputs:
+        for title, body in _output_sections(output):
+            name = canonical_section(title) or title if title else None
+            subsections = merged.setdefault(name, {})
+            for heading, text in _subsections(body):
+                _, blocks, seen = subsections.setdefault(_key(heading) if heading else None, (heading, [], set()))
+                for block in re.split(r"\n\s*\n", text):
+                    lines = [line for line in block.splitlines() if line.strip()]
+                    if lines and all(_LIST_ITEM.match(line) for line in lines):
+                        lines = [line for line in lines if _key(line) not in seen]
+                        seen.update(_key(line) for line in lines)
+                        block = "\n".join(lines)
+                        # New items of a list that an earlier chunk started carry on in the same list
+                        if lines and blocks and all(_LIST_ITEM.match(line) for line in blocks[-1].splitlines()):
+                            blocks[-1] = f"{blocks[-1]}\n{block.strip()}"
+                            continue
+                    elif _key(block) in seen:
+                        continue
+                    else:
+                        seen.add(_key(block))
+                    if block.strip():
+                        blocks.append(block.strip())
+
+    parts = []
+    for name, subsections in merged.items():
+        body = "\n\n".join(
+            "\n\n".join(([heading] if heading else []) + blocks)
+            for heading, blocks, _ in subsections.values()
+            if heading or blocks
+        )
+        parts.append(f"## {name}\n\n{body}".strip() if name else body)
+    return "\n\n".join(part for part in parts if part)
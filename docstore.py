@@ -0,0 +1,63 @@
+import mmap
+import os
+import threading
+import time
+
+from cache import content_digest
+
+# How long an idle document stays in memory, and the size above which it moves off the Python heap
+DOCUMENT_TTL = int(os.getenv("DOCUMENT_TTL", str(60 * 60)))
+DOCUMENT_MMAP_THRESHOLD = int(os.getenv("DOCUMENT_MMAP_THRESHOLD", str(8 * 1024 * 1024)))
+
+
+class DocumentStore:
+    def __init__(self, ttl=DOCUMENT_TTL, mmap_threshold=DOCUMENT_MMAP_THRESHOLD):
+        self.ttl = ttl
+        self.mmap_threshold = mmap_threshold
+        self._lock = threading.Lock()
+        # (session, digest) -> [buffer, last access]
+        self._documents = {}
+
+    def put(self, session_id, data):
+        digest = content_digest(data)
+        with self._lock:
+            self._evict()
+            entry = self._documents.get((session_id, digest))
+            if entry is not None:
+                entry[1] = time.monotonic()
+                return digest
+
+            if len(data) > self.mmap_threshold:
+                buffer = mmap.mmap(-1, len(data))
+                buffer.write(data)
+            else:
+                buffer = data
+            self._documents[(session_id, digest)] = [buffer, time.monotonic()]
+        return digest
+
+    def get(self, session_id, digest):
+        with self._lock:
+            entry = self._documents.get((session_id, digest))
+            if entry is None:
+                return None
+            entry[1] = time.monotonic()
+            return entry[0]
+
+    def discard(self, session_id):
+        with self._lock:
+            for key in [key for key in self._documents if key[0] == session_id]:
+                self._close(self._documents.pop(key)[0])
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl
+        for key in [key for key, (_, accessed) in self._documents.items() if accessed < cutoff]:
+            self._close(self._documents.pop(key)[0])
+
+    @staticmethod
+    def _close(buffer):
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+
+
+# Shared by every run in this process; sessions keep concurrent uploads apart
+DOCUMENTS = DocumentStore()
@@ -0,0 +1,232 @@
+import os
+import re
+import tempfile
+
+from ingest import canonical_section
+
+# Where the formatted SRS is saved, as the LLM formatter used to do with its file tool
+SRS_OUTPUT_PATH = os.getenv("SRS_OUTPUT_PATH", "srs1.md")
+
+# Sections every final SRS must have, and the ones whose BRD text must appear in it unchanged
+REQUIRED_SECTIONS = (
+    "Introduction", "Purpose", "In Scope", "Out of Scope", "Assumptions", "Dependencies", "Conclusion",
+)
+VERBATIM_SECTIONS = ("Out of Scope", "Assumptions")
+
+_MARKDOWN_HEADING = re.compile(r"^(?P<level>#{1,6})\s+(?P<title>.+?)\s*#*$")
+_BOLD_HEADING = re.compile(r"^\*\*(?P<title>[^*]{1,80})\*\*:?$")
+_NUMBERING = re.compile(r"^(\d+(\.\d+)*\.?|[IVX]+\.)\s+")
+_BULLET = re.compile(r"^(?P<indent>\s*)[*+•▪◦‣–]\s+")
+_LIST_ITEM = re.compile(r"^\s*(-|\d+[.)])\s+")
+
+# Bold headings rank below every Markdown heading
+_BOLD_LEVEL = 7
+
+
+class FormatError(ValueError):
+    pass
+
+
+def _title(text):
+    return _NUMBERING.sub("", text.strip().strip("*_: ")).strip("*_: ")
+
+
+def _top_level(lines):
+    levels = [len(m.group("level")) for m in map(_MARKDOWN_HEADING.match, lines) if m]
+    if not levels:
+        return None
+    top = min(levels)
+    # A lone document title above the real sections does not count as the top level
+    if levels.count(top) == 1 and len(set(levels)) > 1:
+        top = min(level for level in levels if level > top)
+    return top
+
+
+def parse_sections(text):
+    # Top-level sections of a Markdown draft as (title, body) pairs, keeping the draft's order
+    lines = text.strip().splitlines()
+    top = _top_level(lines)
+    if top is not None:
+        def heading(line):
+            match = _MARKDOWN_HEADING.match(line)
+            if match and len(match.group("level")) == top:
+                return _title(match.group("title"))
+            return None
+    else:
+        # Plain drafts sometimes use bold lines as headings; only trust the ones naming a known section
+        def heading(line):
+            match = _BOLD_HEADING.match(line.strip())
+            if match and canonical_section(_title(match.group("title"))):
+                return _title(match.group("title"))
+            return None
+
+    sections = []
+    title, body = None, []
+    for line in lines:
+        name = heading(line)
+        if name is None:
+            body.append(line)
+            continue
+        if title is not None or "\n".join(body).strip():
+            sections.append((title, "\n".join(body).strip()))
+        title, body = name, []
+    sections.append((title, "\n".join(body).strip()))
+    return sections
+
+
+def _move(order, name, anchor, after):
+    if name not in order or anchor not in order:
+        return
+    order.remove(name)
+    index = order.index(anchor)
+    order.insert(index + 1 if after else index, name)
+
+
+def _normalize_body(body, bullets=False, nested=True):
+    lines = []
+    for line in body.splitlines():
+        line = _BULLET.sub(lambda m: f"{m.group('indent')}- ", line.rstrip())
+        # Headings inside a section sit below the '## ' section headings
+        match = _MARKDOWN_HEADING.match(line)
+        if nested and match and len(match.group("level")) < 3:
+            line = f"### {match.group('title')}"
+        stripped = line.strip()
+        if bullets and stripped and not _LIST_ITEM.match(line) and not stripped.startswith(("|", "#", ">", "```")):
+            line = f"- {stripped}"
+        lines.append(line)
+    # No more than one blank line in a row
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def format_srs(text):
+    sections = parse_sections(text)
+    preamble = sections[0][1] if sections and sections[0][0] is None else ""
+    named = [(title, body) for title, body in sections if title is not None]
+    if not named:
+        raise FormatError("no section headings found in the draft")
+
+    # Merge repeated headings and key everything by its canonical name where there is one
+    bodies = {}
+    for title, body in named:
+        name = canonical_section(title) or title
+        bodies[name] = f"{bodies[name]}\n\n{body}".strip() if name in bodies else body
+
+    order = list(bodies)
+    _move(order, "Out of Scope", "In Scope", after=True)
+    _move(order, "Assumptions", "Dependencies", after=False)
+    if "Conclusion" in order:
+        order.remove("Conclusion")
+        order.append("Conclusion")
+
+    parts = [_normalize_body(preamble, nested=False)] if preamble else []
+    for number, name in enumerate(order, start=1):
+        body = _normalize_body(bodies[name], bullets=name == "Assumptions")
+        parts.append(f"## {number}. {name.upper()}\n\n{body}".strip())
+    return "\n\n".join(parts) + "\n"
+
+
+def _outline(lines):
+    # Every heading at any level as (line index, level, canonical name or title), so sections nested
+    # the IEEE 830 way (Purpose under Introduction, In and Out of Scope under Scope) are found too
+    headings = []
+    for index, line in enumerate(lines):
+        match = _MARKDOWN_HEADING.match(line)
+        if match:
+            title = _title(match.group("title"))
+            headings.append((index, len(match.group("level")), canonical_section(title) or title))
+            continue
+        match = _BOLD_HEADING.match(line.strip())
+        if match and canonical_section(_title(match.group("title"))):
+            headings.append((index, _BOLD_LEVEL, canonical_section(_title(match.group("title")))))
+    return headings
+
+
+def _span_end(headings, position, total, own_text=False):
+    # A section runs to the next heading at its own level or above; its own text stops at the
+    # first heading of any level
+    level = headings[position][1]
+    for index, next_level, _ in headings[position + 1:]:
+        if own_text or next_level <= level:
+            return index
+    return total
+
+
+def _sections_by_name(text):
+    lines = text.splitlines()
+    headings = _outline(lines)
+    bodies = {}
+    for position, (index, _, name) in enumerate(headings):
+        body = "\n".join(lines[index + 1:_span_end(headings, position, len(lines))]).strip()
+        bodies[name] = f"{bodies[name]}\n\n{body}".strip() if name in bodies else body
+    return bodies
+
+
+def _plain(text):
+    # Compare text while ignoring layout: bullet markers, numbering of list items and whitespace
+    lines = [_LIST_ITEM.sub("", _BULLET.sub("", line)).strip() for line in text.splitlines()]
+    return " ".join(" ".join(lines).split())
+
+
+def validate_srs(text, brd_sections):
+    # Returns the required sections that are missing and the verbatim sections that do not carry
+    # the BRD text unchanged; both empty means the SRS is complete
+    bodies = _sections_by_name(text)
+    altered = [
+        name for name in VERBATIM_SECTIONS
+        if brd_sections.get(name) and _plain(brd_sections[name]) not in _plain(bodies.get(name, ""))
+    ]
+    missing = [name for name in REQUIRED_SECTIONS if name not in bodies and name not in altered]
+    return missing, altered
+
+
+def _heading_line(name, level):
+    return f"**{name}**" if level == _BOLD_LEVEL else f"{'#' * level} {name}"
+
+
+def restore_verbatim(text, brd_sections, names):
+    # Put the BRD text back at the top of each section, wherever in the outline it sits. The writer's
+    # own list items there were its altered copy of that text and are dropped; its commentary is kept
+    lines = text.splitlines()
+    for name in names:
+        verbatim = brd_sections[name].strip().splitlines()
+        headings = _outline(lines)
+        found = [position for position, heading in enumerate(headings) if heading[2] == name]
+        if found:
+            position = found[0]
+            start = headings[position][0] + 1
+            end = _span_end(headings, position, len(lines), own_text=True)
+            commentary = [
+                block.strip() for block in re.split(r"\n\s*\n", "\n".join(lines[start:end]))
+                if block.strip() and not all(_LIST_ITEM.match(line) for line in block.strip().splitlines())
+            ]
+            lines[start:end] = ["", *"\n\n".join(["\n".join(verbatim)] + commentary).splitlines(), ""]
+            continue
+
+        # A missing section goes next to its neighbour and at the neighbour's level
+        anchor, after = ("In Scope", True) if name == "Out of Scope" else ("Dependencies", False)
+        anchors = [position for position, heading in enumerate(headings) if heading[2] == anchor]
+        if anchors:
+            position = anchors[0]
+            level = headings[position][1]
+            at = _span_end(headings, position, len(lines)) if after else headings[position][0]
+        else:
+            level = _top_level(lines) or 2
+            at = len(lines)
+        lines[at:at] = ["", _heading_line(name, level), "", *verbatim, ""]
+    return "\n".join(lines).strip() + "\n"
+
+
+def write_srs(text, path=SRS_OUTPUT_PATH):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    # A temp file of its own next to the target, so runs saving at the same time never share one
+    fd, partial = tempfile.mkstemp(dir=directory or ".", prefix=f".{os.path.basename(path)}.", suffix=".partial")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
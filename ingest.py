@@ -0,0 +1,192 @@
+import io
+import re
+
+from pypdf import PdfReader
+
+from cache import content_digest
+
+# Canonical BRD sections and the heading spellings that map onto them
+SECTION_ALIASES = {
+    "Introduction": ["introduction", "background"],
+    "Purpose": ["purpose", "objective", "objectives"],
+    "Scope": ["scope", "project scope"],
+    "In Scope": ["in scope", "in-scope"],
+    "Out of Scope": ["out of scope", "out-of-scope", "exclusions"],
+    "Assumptions": ["assumptions", "assumption"],
+    "References": ["references", "reference documents"],
+    "Overview": ["overview", "summary", "executive summary"],
+    "Data Model": ["data model", "data models", "data requirements", "entities"],
+    "User Characteristics": ["user characteristics", "users", "user roles", "personas", "stakeholders"],
+    "Codification Schemes": ["codification schemes", "codification scheme", "coding schemes", "naming conventions"],
+    "Dependencies": ["dependencies", "dependency", "integrations", "constraints"],
+    "Requirements": ["requirements", "business requirements"],
+    "Functional Requirements": ["functional requirements"],
+    "Non-Functional Requirements": ["non-functional requirements", "nonfunctional requirements", "non functional requirements"],
+    "Technical Requirements": ["technical requirements"],
+    "Conclusion": ["conclusion", "conclusions", "closing remarks"],
+}
+
+# Which sections each task reads; None means every section not claimed elsewhere is fine too
+TASK_SECTIONS = {
+    "business_analysis": [
+        "Introduction", "Purpose", "Scope", "In Scope", "Out of Scope",
+        "Assumptions", "References", "Overview",
+    ],
+    "technical_analysis": [
+        "Data Model", "User Characteristics", "Codification Schemes", "Dependencies",
+    ],
+    "requirement_categorization": [
+        "Scope", "In Scope", "Requirements", "Functional Requirements",
+        "Non-Functional Requirements", "Technical Requirements", "Data Model", "Dependencies", None,
+    ],
+    "srs_draft": ["Out of Scope", "Assumptions"],
+}
+
+_ALIAS_LOOKUP = {alias: name for name, aliases in SECTION_ALIASES.items() for alias in aliases}
+_NUMBERED_HEADING = re.compile(r"^(?P<number>\d+(\.\d+)*\.?|[IVX]+\.)\s+(?P<title>[^.]{1,80})$")
+_ROMAN = {"I": 1, "V": 5, "X": 10}
+_MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+(?P<title>.+)$")
+
+
+def extract_text(data, filename):
+    if filename.lower().endswith(".pdf"):
+        reader = PdfReader(io.BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    return data.decode("utf-8", errors="replace")
+
+
+def _normalize(title):
+    title = re.sub(r"[*_:#]+", " ", title)
+    return " ".join(title.lower().split())
+
+
+def canonical_section(title):
+    return _ALIAS_LOOKUP.get(_normalize(title))
+
+
+def _top_number(number):
+    # Value of a top-level number such as "4", "4." or "IV."; None for "4.1" and the like
+    number = number.rstrip(".")
+    if number.isdigit():
+        return int(number)
+    if number and all(c in _ROMAN for c in number):
+        values = [_ROMAN[c] for c in number]
+        return sum(-v if i + 1 < len(values) and v < values[i + 1] else v for i, v in enumerate(values))
+    return None
+
+
+def _heading(line):
+    # Returns (section name, top-level number or None), or None for body text
+    stripped = line.strip()
+    if not stripped or len(stripped) > 80:
+        return None
+
+    match = _MARKDOWN_HEADING.match(stripped)
+    if match:
+        title = match.group("title").strip()
+        return _ALIAS_LOOKUP.get(_normalize(title), title.strip("*_: ")), None
+
+    match = _NUMBERED_HEADING.match(stripped)
+    if match:
+        title = match.group("title").strip()
+        return _ALIAS_LOOKUP.get(_normalize(title), title.strip("*_: ")), _top_number(match.group("number"))
+
+    # Bare headings only count when they name a section we know about
+    name = _ALIAS_LOOKUP.get(_normalize(stripped))
+    return (name, None) if name else None
+
+
+def split_sections(text):
+    sections = {}
+    current = None
+    lines = []
+    # Numbers of the last numbered heading and of the last numbered list item in the current section
+    heading_number = None
+    item_number = None
+    seen_heading = False
+
+    def flush():
+        body = "\n".join(lines).strip()
+        if current is None and not body:
+            return
+        name = current or "Preamble"
+        sections[name] = f"{sections[name]}\n\n{body}".strip() if name in sections else body
+
+    for line in text.splitlines():
+        heading = _heading(line)
+        numbered = _NUMBERED_HEADING.match(line.strip())
+        if heading is not None and numbered and not canonical_section(numbered.group("title")):
+            # A numbered line with an unknown title is only a heading when it is the next top-level
+            # number of the document's headings; list items and sub-numbered lines stay in the body
+            number = heading[1]
+            expected = heading_number + 1 if heading_number is not None else (None if seen_heading else 1)
+            if number is None or number != expected or (item_number is not None and number == item_number + 1):
+                heading = None
+        if heading is None:
+            if numbered:
+                item_number = _top_number(numbered.group("number"))
+            lines.append(line)
+            continue
+        flush()
+        current, number = heading
+        if number is not None:
+            heading_number = number
+        seen_heading = True
+        item_number = None
+        lines = []
+    flush()
+    return sections
+
+
+def format_sections(sections, names):
+    return "\n\n".join(f"## {name}\n{sections[name]}" for name in names if name in sections)
+
+
+def _slice_names(sections, task_name):
+    wanted = TASK_SECTIONS[task_name]
+    names = [name for name in wanted if name is not None and name in sections]
+
+    # Pick up sections no task asked for by name, so nothing in the BRD is dropped entirely
+    if None in wanted:
+        claimed = {name for route in TASK_SECTIONS.values() for name in route}
+        names += [name for name in sections if name not in claimed]
+    return names
+
+
+def task_slice(sections, text, task_name):
+    excerpt = format_sections(sections, _slice_names(sections, task_name))
+    # Fall back to the whole document when the BRD's headings do not match what we expect
+    return excerpt or text
+
+
+def changed_sections(previous, current):
+    # Section names whose text was added, removed or edited between two sets of section digests
+    names = list(current) + [name for name in previous if name not in current]
+    return [name for name in names if previous.get(name) != current.get(name)]
+
+
+def affected_tasks(changed, previous, current):
+    # Tasks whose input changed between two revisions, given both revisions' section digests. A task
+    # that found none of its sections in either one was fed the whole document, so any change counts
+    tasks = [
+        task for task in TASK_SECTIONS
+        if any(name in _slice_names(previous, task) or name in _slice_names(current, task) for name in changed)
+        or (changed and not (_slice_names(previous, task) and _slice_names(current, task)))
+    ]
+    # Whatever an analysis feeds into has to be written again as well
+    if tasks and "srs_draft" not in tasks:
+        tasks.append("srs_draft")
+    return tasks + ["srs_format"] if tasks else []
+
+
+class BRDocument:
+    def __init__(self, data, filename):
+        self.filename = filename
+        self.text = extract_text(data, filename)
+        self.sections = split_sections(self.text)
+
+    def slice_for(self, task_name):
+        return task_slice(self.sections, self.text, task_name)
+
+    def section_digests(self):
+        return {name: content_digest(body) for name, body in self.sections.items()}
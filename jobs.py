@@ -0,0 +1,297 @@
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Where job state lives and how many generations may run at once on this instance
+JOBS_PATH = os.getenv("JOBS_PATH", os.path.join("cache", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobStore:
+    def __init__(self, path=JOBS_PATH):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, filename TEXT NOT NULL, status TEXT NOT NULL, "
+                "result TEXT, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_events ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, "
+                "kind TEXT NOT NULL, task TEXT NOT NULL, payload TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq)")
+            # What a failed job needs to be resumed: its inputs and the output of every task it finished
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_inputs ("
+                "job_id TEXT PRIMARY KEY, data BLOB NOT NULL, topic TEXT, "
+                "concurrency INTEGER NOT NULL, bypass_cache INTEGER NOT NULL, revision_scope TEXT)"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(job_inputs)")]
+            if "revision_scope" not in columns:
+                self._conn.execute("ALTER TABLE job_inputs ADD COLUMN revision_scope TEXT")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_checkpoints ("
+                "job_id TEXT NOT NULL, task TEXT NOT NULL, output TEXT NOT NULL, "
+                "PRIMARY KEY (job_id, task))"
+            )
+
+    def create(self, filename):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, filename, status, created, updated) VALUES (?, ?, ?, ?, ?)",
+                (job_id, filename, QUEUED, now, now),
+            )
+        return job_id
+
+    def set_status(self, job_id, status, result=None, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id),
+            )
+
+    def add_event(self, job_id, kind, task, payload=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO job_events (job_id, kind, task, payload) VALUES (?, ?, ?, ?)",
+                (job_id, kind, task, payload),
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, filename, status, result, error, created, updated FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "filename", "status", "result", "error", "created", "updated")
+        return dict(zip(keys, row))
+
+    def events(self, job_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT kind, task, payload FROM job_events WHERE job_id = ? ORDER BY seq",
+                (job_id,),
+            ).fetchall()
+
+    def save_inputs(self, job_id, data, topic, concurrency, bypass_cache, revision_scope=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_inputs (job_id, data, topic, concurrency, bypass_cache, revision_scope) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, data, topic, concurrency, int(bypass_cache), revision_scope),
+            )
+
+    def inputs(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, topic, concurrency, bypass_cache, revision_scope FROM job_inputs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("data", "topic", "concurrency", "bypass_cache", "revision_scope")
+        return dict(zip(keys, row), bypass_cache=bool(row[3]))
+
+    def save_checkpoint(self, job_id, task, output):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_checkpoints (job_id, task, output) VALUES (?, ?, ?)",
+                (job_id, task, output),
+            )
+
+    def checkpoints(self, job_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT task, output FROM job_checkpoints WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def discard_resume_state(self, job_id):
+        # A finished job is never resumed, so its inputs and checkpoints can go
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM job_inputs WHERE job_id = ?", (job_id,))
+            self._conn.execute("DELETE FROM job_checkpoints WHERE job_id = ?", (job_id,))
+
+    def fail_unfinished(self, job_id, error):
+        # Leaves a job that already reached a final state alone
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ? AND status IN (?, ?)",
+                (FAILED, error, time.time(), job_id, QUEUED, RUNNING),
+            )
+
+    def abandon_unfinished(self):
+        # Workers die with the server, so anything still open belongs to a previous instance
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated = ? WHERE status IN (?, ?)",
+                (FAILED, "Interrupted by a server restart", time.time(), QUEUED, RUNNING),
+            )
+
+
+class JobEvents:
+    # Queue-like adapter so run_pipeline's progress events land in the job store
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def put(self, event):
+        kind, task, payload = event
+        if kind == "checkpoint":
+            self.store.save_checkpoint(self.job_id, task, payload)
+            return
+        self.store.add_event(self.job_id, kind, task, payload)
+
+
+_worker_state = {}
+
+
+def _init_worker():
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    # Worker processes start from a clean interpreter, so repeat the sqlite swap app.py does
+    try:
+        __import__('pysqlite3')
+    except ImportError:
+        return
+    sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
+
+
+def _worker_resources():
+    # Import crewai and build the agent templates once per worker process
+    if not _worker_state:
+        started = time.perf_counter()
+        import pipeline
+        from cache import ResultCache
+
+        # Only publish a complete set, so a setup that failed halfway is retried by the next job
+        _worker_state.update(
+            pipeline=pipeline,
+            templates=pipeline.build_templates(),
+            cache=ResultCache(),
+            store=JobStore(),
+        )
+        logger.info("Loaded pipeline and agent templates in %.2fs", time.perf_counter() - started)
+    return _worker_state
+
+
+def run_job(job_id, data, filename, topic, concurrency, bypass_cache, revision_scope=None, checkpoints=None):
+    store = None
+    try:
+        resources = _worker_resources()
+        store = resources["store"]
+        store.set_status(job_id, RUNNING)
+        output = resources["pipeline"].run_pipeline(
+            resources["templates"],
+            data,
+            filename,
+            topic,
+            resources["cache"],
+            concurrency=concurrency,
+            bypass_cache=bypass_cache,
+            events=JobEvents(store, job_id),
+            session_id=job_id,
+            checkpoints=checkpoints,
+            output_path=None,
+            revision_scope=revision_scope,
+        )
+    except Exception as e:
+        logger.exception("Job %s failed", job_id)
+        # Setup may have failed before there was a store; anything raised here reaches the done callback
+        (store or JobStore()).set_status(job_id, FAILED, error=str(e))
+        return
+    store.set_status(job_id, DONE, result=output.raw)
+    store.discard_resume_state(job_id)
+
+
+class JobQueue:
+    def __init__(self, max_workers=JOB_WORKERS):
+        self.store = JobStore()
+        self.store.abandon_unfinished()
+        self.max_workers = max_workers
+        self._pool_lock = threading.Lock()
+        self._pool = self._new_pool()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _submit(self, job_id, *args):
+        with self._pool_lock:
+            try:
+                future = self._pool.submit(run_job, job_id, *args)
+            except BrokenProcessPool:
+                # A worker died (out of memory, killed) and the pool takes no more work; start a new one
+                logger.warning("Job worker pool is broken, starting a new one")
+                self._pool.shutdown(wait=False)
+                self._pool = self._new_pool()
+                future = self._pool.submit(run_job, job_id, *args)
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+
+    def _finished(self, job_id, future):
+        # run_job records its own failures; this catches the ones it never got to report, such as
+        # a dying worker, so no job is left queued or running forever
+        error = "Cancelled" if future.cancelled() else future.exception()
+        if error is not None:
+            logger.error("Job %s did not finish: %s", job_id, error)
+            self.store.fail_unfinished(job_id, str(error) or type(error).__name__)
+
+    def submit(self, data, filename, topic, concurrency, bypass_cache=False, revision_scope=None):
+        job_id = self.store.create(filename)
+        self.store.save_inputs(job_id, data, topic, concurrency, bypass_cache, revision_scope)
+        self._submit(job_id, data, filename, topic, concurrency, bypass_cache, revision_scope)
+        return job_id
+
+    def resume(self, job_id):
+        # Run a failed job again, restoring every task it finished so it restarts at the first failed one
+        job = self.store.get(job_id)
+        inputs = self.store.inputs(job_id)
+        if job is None or job["status"] != FAILED or inputs is None:
+            return False
+        self.store.set_status(job_id, QUEUED)
+        self._submit(
+            job_id,
+            inputs["data"],
+            job["filename"],
+            inputs["topic"],
+            inputs["concurrency"],
+            inputs["bypass_cache"],
+            inputs["revision_scope"],
+            self.store.checkpoints(job_id),
+        )
+        return True
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def events(self, job_id):
+        return self.store.events(job_id)
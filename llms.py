@@ -0,0 +1,222 @@
+import copy
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import litellm
+from crewai import LLM
+from crewai.cli.constants import DEFAULT_LLM_MODEL
+from crewai.utilities.events import LLMCallFailedEvent, LLMCallStartedEvent, crewai_event_bus
+from crewai.utilities.events.llm_events import LLMCallType
+
+logger = logging.getLogger(__name__)
+
+# Model routing: cheap, mechanical agents get the fast model and the SRS writer gets the strong one.
+# Every agent can also be pointed somewhere else on its own, e.g. SRS_WRITER_MODEL=...
+MODEL = os.getenv("MODEL", DEFAULT_LLM_MODEL)
+FAST_MODEL = os.getenv("FAST_MODEL", MODEL)
+STRONG_MODEL = os.getenv("STRONG_MODEL", MODEL)
+AGENT_MODELS = {
+    "business_analyst": os.getenv("BUSINESS_ANALYST_MODEL", MODEL),
+    "technical_analyst": os.getenv("TECHNICAL_ANALYST_MODEL", MODEL),
+    "requirement_categorizer": os.getenv("REQUIREMENT_CATEGORIZER_MODEL", FAST_MODEL),
+    "srs_writer": os.getenv("SRS_WRITER_MODEL", STRONG_MODEL),
+    "srs_formatter": os.getenv("SRS_FORMATTER_MODEL", FAST_MODEL),
+}
+
+# Calls that time out or get throttled are retried once on this model; empty disables it
+FALLBACK_MODEL = os.getenv("FALLBACK_MODEL", "")
+
+# Process-wide limits shared by every agent and every run in this process
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+
+def _seconds(name, default=None):
+    value = os.getenv(name, "")
+    return float(value) if value else default
+
+
+# Seconds before a call gives up. Unset means no client-side limit: the SRS writer on a large BRD can
+# legitimately stream for minutes. Each agent can get its own limit, e.g. SRS_FORMATTER_TIMEOUT=60
+LLM_TIMEOUT = _seconds("LLM_TIMEOUT")
+AGENT_TIMEOUTS = {agent: _seconds(f"{agent.upper()}_TIMEOUT", LLM_TIMEOUT) for agent in AGENT_MODELS}
+
+_setup_lock = threading.Lock()
+_shared_limiter = None
+
+# Where the answer being generated on this thread goes, piece by piece; see streaming()
+_stream = threading.local()
+
+
+class RateLimiter:
+    # Spaces calls evenly so everything sharing the limiter stays under the per-minute budget,
+    # and optionally caps how many calls are in flight at once
+    def __init__(self, requests_per_minute=0, max_concurrent=0):
+        self._interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+    @contextmanager
+    def slot(self):
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            self.acquire()
+            yield
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+
+def configure_client():
+    # One pooled HTTP client for every litellm call in the process, so connections are reused
+    # instead of every agent opening its own
+    with _setup_lock:
+        if litellm.client_session is None:
+            # No limit of its own: each call passes its agent's timeout
+            litellm.client_session = httpx.Client(
+                timeout=None,
+                limits=httpx.Limits(
+                    max_connections=max(LLM_MAX_CONCURRENCY, 1) * 2,
+                    max_keepalive_connections=max(LLM_MAX_CONCURRENCY, 1),
+                ),
+            )
+
+
+@contextmanager
+def streaming(callback):
+    # While active, plain answers on this thread are requested with stream=True and every piece of
+    # text is passed to callback as it arrives. crewai runs a task's LLM calls on the thread that
+    # started it, so this covers exactly one task
+    _stream.callback = callback
+    try:
+        yield
+    finally:
+        _stream.callback = None
+
+
+def shared_limiter():
+    global _shared_limiter
+    with _setup_lock:
+        if _shared_limiter is None:
+            _shared_limiter = RateLimiter(LLM_RPM, LLM_MAX_CONCURRENCY)
+        return _shared_limiter
+
+
+class RateLimitedLLM(LLM):
+    def __init__(self, model, limiter=None, fallback_model=None, **kwargs):
+        super().__init__(model=model, **kwargs)
+        self.limiter = limiter
+        self.fallback_model = fallback_model
+
+    def call(self, *args, **kwargs):
+        try:
+            if self.limiter is None:
+                return self._call(*args, **kwargs)
+            with self.limiter.slot():
+                return self._call(*args, **kwargs)
+        except (litellm.Timeout, litellm.RateLimitError) as e:
+            if not self.fallback_model or self.fallback_model == self.model:
+                raise
+            logger.warning("%s failed with %s, retrying on %s", self.model, type(e).__name__, self.fallback_model)
+            # Same settings and limiter, different model; the fallback does not fall back again
+            fallback = copy.copy(self)
+            fallback.model = self.fallback_model
+            fallback.fallback_model = None
+            return fallback.call(*args, **kwargs)
+
+
+    def _call(self, messages, tools=None, callbacks=None, available_functions=None):
+        callback = getattr(_stream, "callback", None)
+        # Function calling needs the whole response at once, so only plain answers stream
+        if callback is None or tools:
+            return super().call(messages, tools, callbacks, available_functions)
+        return self._stream_call(messages, callbacks, callback)
+
+    def _stream_call(self, messages, callbacks, callback):
+        # LLM.call with stream=True: the same parameters, events and usage reporting, but the answer
+        # reaches callback while it is being written
+        crewai_event_bus.emit(self, event=LLMCallStartedEvent(messages=messages, callbacks=callbacks))
+        self._validate_call_params()
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        if "o1" in self.model.lower():
+            for message in messages:
+                if message.get("role") == "system":
+                    message["role"] = "assistant"
+        if callbacks:
+            self.set_callbacks(callbacks)
+
+        try:
+            formatted = self._format_messages_for_provider(messages)
+            params = {
+                "model": self.model,
+                "messages": formatted,
+                "timeout": self.timeout,
+                "temperature": self.temperature,
+                "top_p": self.top_p,
+                "n": self.n,
+                "stop": self.stop,
+                "max_tokens": self.max_tokens or self.max_completion_tokens,
+                "presence_penalty": self.presence_penalty,
+                "frequency_penalty": self.frequency_penalty,
+                "logit_bias": self.logit_bias,
+                "response_format": self.response_format,
+                "seed": self.seed,
+                "logprobs": self.logprobs,
+                "top_logprobs": self.top_logprobs,
+                "api_base": self.api_base,
+                "base_url": self.base_url,
+                "api_version": self.api_version,
+                "api_key": self.api_key,
+                "stream": True,
+                "reasoning_effort": self.reasoning_effort,
+                **self.additional_params,
+            }
+            params = {key: value for key, value in params.items() if value is not None}
+
+            chunks = []
+            for chunk in litellm.completion(**params):
+                chunks.append(chunk)
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    callback(text)
+            # Rebuilds the full response, with usage counted locally when the provider sent none
+            response = litellm.stream_chunk_builder(chunks, messages=formatted)
+            answer = response.choices[0].message.content or ""
+            usage = getattr(response, "usage", None)
+            for handler in callbacks or []:
+                if usage and hasattr(handler, "log_success_event"):
+                    handler.log_success_event(kwargs=params, response_obj={"usage": usage}, start_time=0, end_time=0)
+        except Exception as e:
+            crewai_event_bus.emit(self, event=LLMCallFailedEvent(error=str(e)))
+            raise
+        self._handle_emit_call_events(answer, LLMCallType.LLM_CALL)
+        return answer
+
+
+def routed_llm(model, limiter=None, timeout=LLM_TIMEOUT):
+    configure_client()
+    return RateLimitedLLM(
+        model,
+        limiter=limiter or shared_limiter(),
+        fallback_model=FALLBACK_MODEL or None,
+        timeout=timeout,
+    )
+
+
+def agent_llm(agent, limiter=None):
+    return routed_llm(AGENT_MODELS[agent], limiter, AGENT_TIMEOUTS[agent])
@@ -0,0 +1,185 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import litellm
+from crewai.utilities.events import (
+    LLMCallCompletedEvent,
+    LLMCallFailedEvent,
+    ToolUsageFinishedEvent,
+    crewai_event_bus,
+)
+
+# JSONL log with one line per task run; the Prometheus textfile is only written when configured
+METRICS_LOG = os.getenv("METRICS_LOG", os.path.join("cache", "metrics.jsonl"))
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE", "")
+
+_current = threading.local()
+_install_lock = threading.Lock()
+_handlers_registered = False
+
+
+class TaskMetrics:
+    def __init__(self, task, agent, model, cached=False):
+        self.task = task
+        self.agent = agent
+        self.model = model
+        self.cached = cached
+        self.wall_time = 0.0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tool_calls = 0
+        self.tool_time = 0.0
+        self.retries = 0
+        self.cost = 0.0
+        # Longest single answer, to tell whether a call ran into its max_tokens cap
+        self.longest_response = ""
+
+    def add_usage(self, usage):
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.cost += estimate_cost(self.model, usage.prompt_tokens, usage.completion_tokens)
+
+    def as_dict(self):
+        return {
+            "task": self.task,
+            "agent": self.agent,
+            "model": self.model,
+            "cached": self.cached,
+            "wall_time": round(self.wall_time, 3),
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tool_calls": self.tool_calls,
+            "tool_time": round(self.tool_time, 3),
+            "retries": self.retries,
+            "cost": round(self.cost, 6),
+        }
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    # litellm only knows prices for models in its table; anything else counts as free
+    try:
+        prompt_cost, completion_cost = litellm.cost_per_token(
+            model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+    except Exception:
+        return 0.0
+    return prompt_cost + completion_cost
+
+
+def _on_llm_completed(source, event):
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        metrics.llm_calls += 1
+        response = event.response if isinstance(event.response, str) else ""
+        if len(response) > len(metrics.longest_response):
+            metrics.longest_response = response
+
+
+def _on_llm_failed(source, event):
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        metrics.retries += 1
+
+
+def _on_tool_finished(source, event):
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        metrics.tool_calls += 1
+        metrics.tool_time += (event.finished_at - event.started_at).total_seconds()
+
+
+def install():
+    # The event bus is process-wide and calls handlers on the emitting thread,
+    # which is the thread running the task, so a thread-local tells tasks apart
+    global _handlers_registered
+    with _install_lock:
+        if _handlers_registered:
+            return
+        crewai_event_bus.register_handler(LLMCallCompletedEvent, _on_llm_completed)
+        crewai_event_bus.register_handler(LLMCallFailedEvent, _on_llm_failed)
+        crewai_event_bus.register_handler(ToolUsageFinishedEvent, _on_tool_finished)
+        _handlers_registered = True
+
+
+@contextmanager
+def recording(metrics):
+    install()
+    _current.metrics = metrics
+    started = time.perf_counter()
+    try:
+        yield metrics
+    finally:
+        metrics.wall_time = time.perf_counter() - started
+        _current.metrics = None
+
+
+def write_run(filename, task_metrics, wall_time, path=METRICS_LOG, prom_path=METRICS_PROM_FILE):
+    run_id = uuid.uuid4().hex
+    timestamp = time.time()
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, "a", encoding="utf-8") as f:
+        for metrics in task_metrics:
+            record = {
+                "run_id": run_id,
+                "timestamp": timestamp,
+                "filename": filename,
+                "run_wall_time": round(wall_time, 3),
+                **metrics,
+            }
+            f.write(json.dumps(record) + "\n")
+
+    if prom_path:
+        write_prometheus(task_metrics, wall_time, prom_path)
+    return run_id
+
+
+def _label(value):
+    # Prometheus label values escape backslashes, double quotes and newlines
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus(task_metrics, wall_time, path):
+    # Textfile collector format for the most recent run; replaced atomically on every run
+    lines = [
+        "# TYPE srs_run_wall_seconds gauge",
+        f"srs_run_wall_seconds {wall_time:.3f}",
+    ]
+    gauges = ("wall_time", "llm_calls", "prompt_tokens", "completion_tokens", "tool_calls", "tool_time", "retries", "cost")
+
+    # Chunked and condensed tasks log one record per part; the collector rejects repeated series, so
+    # report one per task and model. Parts run side by side, so wall time is the slowest part's
+    series = {}
+    for metrics in task_metrics:
+        totals = series.setdefault((metrics["task"], metrics["model"]), dict.fromkeys(gauges, 0))
+        for name in gauges:
+            if name == "wall_time":
+                totals[name] = max(totals[name], metrics[name])
+            else:
+                totals[name] += metrics[name]
+
+    for name in gauges:
+        lines.append(f"# TYPE srs_task_{name} gauge")
+        for (task, model), totals in series.items():
+            value = round(totals[name], 6)
+            lines.append(f'srs_task_{name}{{task="{_label(task)}",model="{_label(model)}"}} {value}')
+
+    # Each writer gets its own temp file, so processes finishing runs together never clobber one another's
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".partial")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(partial, path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
@@ -0,0 +1,601 @@
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from crewai import Agent, Crew, Process, Task
+from crewai.tasks.task_output import TaskOutput
+
+from cache import task_key
+from chunking import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, CONDENSE_ROUNDS, merge_outputs, split_chunks
+from docstore import DOCUMENTS
+from formatter import SRS_OUTPUT_PATH, FormatError, format_srs, restore_verbatim, validate_srs, write_srs
+from ingest import TASK_SECTIONS, BRDocument, affected_tasks, changed_sections
+from llms import agent_llm, streaming
+from metrics import TaskMetrics, recording, write_run
+from prompts import TEMPLATES, count_tokens
+from tools import DocumentReadTool
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how many of the independent analysis tasks run at once
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY", "3"))
+
+# Crews print every step to stdout unless this is turned off
+CREW_VERBOSE = os.getenv("CREW_VERBOSE", "true").lower() in ("1", "true", "yes")
+
+# Format the writer's draft locally and only ask the formatter agent when the draft cannot be parsed
+LOCAL_FORMATTER = os.getenv("LOCAL_FORMATTER", "true").lower() in ("1", "true", "yes")
+
+# Answers are counted with a local tokenizer, which can differ a little from the provider's, so
+# anything within this share of max_tokens counts as having hit the cap
+OUTPUT_CAP_MARGIN = float(os.getenv("OUTPUT_CAP_MARGIN", "0.95"))
+
+# Stream the running task's answer to the UI as it is written, in batches of this many seconds
+STREAM_TOKENS = os.getenv("STREAM_TOKENS", "true").lower() in ("1", "true", "yes")
+STREAM_INTERVAL = float(os.getenv("STREAM_INTERVAL", "0.5"))
+
+
+def build_templates(llm=None, limiter=None):
+    # Static agent and task definitions; nothing in here depends on the upload.
+    # Without an explicit llm every agent gets the model routed to it in llms.py
+    business_analyst = Agent(
+        role='Business Analyst',
+        goal=(
+        "Extracts relevant content from the given business requirements document, including "
+        "Introduction, Purpose, In Scope, Out of Scope, Assumptions, References and Overview. "
+        "Enhances unclear sections using the LLM and internet sources to ensure completeness "
+        "before passing refined content for documentation."
+        ),
+        backstory=(
+        "A senior business analyst with expertise in understanding business requirements and "
+        "ensuring clarity in documentation."
+        ),
+        llm=llm or agent_llm("business_analyst", limiter),
+    )
+
+    technical_analyst = Agent(
+        role='Technical Analyst',
+        goal=(
+        "Analyzes the business requirements document to identify technical aspects, including "
+        "Data Model, User Characteristics, Codification Schemes and Dependencies. Uses the LLM "
+        "and internet to enhance unclear details before passing structured insights for documentation."
+        ),
+        backstory=(
+        "A senior technical analyst with expertise in translating business needs into clear technical "
+        "specifications."
+        ),
+        llm=llm or agent_llm("technical_analyst", limiter),
+    )
+
+    requirement_categorizer = Agent(
+        role='Requirement Categorizer',
+        goal=(
+        "Classifies extracted requirements into Functional, Non-Functional, and Technical categories. "
+        "Ensures clarity by refining vague or incomplete sections using the LLM and internet sources "
+        "before passing structured requirements for SRS documentation."
+        ),
+        backstory=(
+        "A senior analyst specializing in categorizing and refining requirements to ensure clarity and completeness."
+        ),
+        llm=llm or agent_llm("requirement_categorizer", limiter),
+    )
+
+    srs_writer = Agent(
+        role='System Requirements Specifications Writer',
+        goal=(
+        "Writes a structured SRS document by incorporating the extracted and categorized requirements. "
+        "Enhances the content for grammatical accuracy, professionalism, and clarity."
+        ),
+        backstory=(
+        "A professional writer specializing in crafting well-structured and polished SRS documents."
+        ),
+        llm=llm or agent_llm("srs_writer", limiter),
+    )
+
+    srs_formatter = Agent(
+        role='System Requirements Specifications Formatter',
+        goal=(
+        "Organizes the document with appropriate formatting, headings, and structure. Ensures that the final "
+        "document is readable, structured, and includes a 'Dependencies' section which points out the dependencies "
+        "on third-party APIs, database requirements, hardware constraints or system integrations and a 'Conclusion' "
+        "section summarizing key insights."
+        ),
+        backstory=(
+        "A document specialist with expertise in structuring and formatting professional reports."
+        ),
+        llm=llm or agent_llm("srs_formatter", limiter),
+    )
+
+    business_analysis_task = Task(
+        name="business_analysis",
+        description=TEMPLATES["business_analysis"].description,
+        expected_output=TEMPLATES["business_analysis"].expected_output,
+        agent=business_analyst,
+    )
+
+    technical_analysis_task = Task(
+        name="technical_analysis",
+        description=TEMPLATES["technical_analysis"].description,
+        expected_output=TEMPLATES["technical_analysis"].expected_output,
+        agent=technical_analyst,
+    )
+
+    requirement_categorize_task = Task(
+        name="requirement_categorization",
+        description=TEMPLATES["requirement_categorization"].description,
+        expected_output=TEMPLATES["requirement_categorization"].expected_output,
+        agent=requirement_categorizer,
+    )
+
+    srs_write_task = Task(
+        name="srs_draft",
+        description=TEMPLATES["srs_draft"].description,
+        expected_output=TEMPLATES["srs_draft"].expected_output,
+        agent=srs_writer,
+        context=[business_analysis_task, technical_analysis_task, requirement_categorize_task],
+    )
+
+    srs_format_task = Task(
+        name="srs_format",
+        description=TEMPLATES["srs_format"].description,
+        expected_output=TEMPLATES["srs_format"].expected_output,
+        agent=srs_formatter,
+        context=[srs_write_task],
+    )
+
+    agents = [business_analyst, technical_analyst, requirement_categorizer, srs_writer, srs_formatter]
+    tasks = [business_analysis_task, technical_analysis_task, requirement_categorize_task, srs_write_task, srs_format_task]
+    return agents, tasks
+
+
+def bind_templates(templates, read_tool):
+    # Fresh copies per run so concurrent sessions never share task outputs or executors
+    agents, tasks = templates
+    copies = {agent.role: agent.copy() for agent in agents}
+
+    # Only the read tool depends on the upload. No agent gets a file writer: the SRS is saved by
+    # write_srs alone, wherever the caller asked for it
+    copies["System Requirements Specifications Writer"].tools = [read_tool]
+    copies["System Requirements Specifications Formatter"].tools = []
+
+    mapping = {}
+    for task in tasks:
+        mapping[task.key] = task.copy(list(copies.values()), mapping)
+    bound = {task.name: task for task in mapping.values()}
+
+    # Cap each answer at its task's output budget; every agent copy has its own LLM copy
+    for name, task in bound.items():
+        output_tokens = TEMPLATES[name].output_tokens
+        if output_tokens and hasattr(task.agent.llm, "max_tokens"):
+            task.agent.llm.max_tokens = output_tokens
+    return bound
+
+
+class TokenStream:
+    # Collects the answer being streamed and passes it on as "token" events at most every
+    # STREAM_INTERVAL seconds, so a job does not write one row per token
+    def __init__(self, emit):
+        self.emit = emit
+        self.pieces = []
+        self.flushed = time.monotonic()
+
+    def __call__(self, text):
+        self.pieces.append(text)
+        if time.monotonic() - self.flushed >= STREAM_INTERVAL:
+            self.emit("token", "".join(self.pieces))
+            self.pieces = []
+            self.flushed = time.monotonic()
+
+    def reset(self):
+        # The answer is complete and reported as a step; what is left over belongs to it
+        self.pieces = []
+
+
+def run_task(agent, task, inputs, cache, bypass_cache=False, events=None, task_metrics=None, stream=True):
+    # stream=False for tasks that run side by side under one name, whose tokens would interleave
+    def emit(kind, payload=None):
+        if events is not None:
+            events.put((kind, task.name, payload))
+
+    metrics = TaskMetrics(task.name, agent.role, getattr(agent.llm, "model", str(agent.llm)))
+    try:
+        with recording(metrics):
+            key = task_key(task, inputs)
+
+            # Reuse the stored output when this task already ran on the same BRD sections and context
+            if not bypass_cache:
+                cached = cache.get(key)
+                if cached is not None:
+                    metrics.cached = True
+                    task.output = TaskOutput(
+                        description=task.description,
+                        expected_output=task.expected_output,
+                        raw=cached,
+                        agent=agent.role,
+                    )
+                    emit("done", task.output.raw)
+                    return task.output
+
+            # Forward the answer being written and every agent step (thoughts, tool calls, answers)
+            # to the UI while the task runs
+            emit("start")
+            tokens = TokenStream(emit)
+
+            def step_callback(step):
+                tokens.reset()
+                emit("step", getattr(step, "text", None) or str(step))
+
+            agent.step_callback = step_callback
+
+            # Each task gets its own single-task crew so they can run side by side
+            crew = Crew(
+                agents=[agent],
+                tasks=[task],
+                process=Process.sequential,
+                verbose=CREW_VERBOSE,
+            )
+            with streaming(tokens if STREAM_TOKENS and stream and events is not None else None):
+                crew.kickoff(inputs=inputs)
+            metrics.add_usage(crew.usage_metrics)
+
+        # The output budget is passed as max_tokens, so an answer that used all of it was cut off.
+        # It is not cached, so the next run (perhaps with a larger budget) asks again
+        cap = getattr(agent.llm, "max_tokens", None)
+        truncated = False
+        if cap and metrics.longest_response:
+            used = count_tokens(metrics.longest_response, metrics.model)
+            truncated = used >= cap * OUTPUT_CAP_MARGIN
+            if truncated:
+                warning = f"{task.name}: an answer used {used} of its {cap} output tokens and was probably cut off"
+                logger.warning(warning)
+                emit("warning", warning)
+
+        if not truncated:
+            cache.put(key, task.output.raw)
+        emit("done", task.output.raw)
+        return task.output
+    finally:
+        if task_metrics is not None:
+            task_metrics.append(metrics.as_dict())
+
+
+def context_shares(task, brd):
+    # Splits what the writer's input budget leaves after its instructions and BRD slice between its
+    # context tasks; smaller outputs keep their size and the rest is shared among the larger ones
+    budget = TEMPLATES[task.name].brd_budget(model=getattr(task.agent.llm, "model", None))
+    if budget is None:
+        return {}
+    model = getattr(task.agent.llm, "model", None)
+    # The verbatim BRD slice gets at most half; fit() trims it to whatever the context leaves
+    available = max(budget - min(count_tokens(brd, model), budget // 2), 0)
+    sizes = sorted(
+        ((count_tokens(t.output.raw, model), t) for t in task.context or [] if t.output is not None),
+        key=lambda item: item[0],
+    )
+    shares = {}
+    for position, (size, context_task) in enumerate(sizes):
+        share = available // (len(sizes) - position)
+        shares[context_task.name] = share
+        available -= min(size, share)
+    return shares
+
+
+def condense(task, limit, concurrency, cache, bypass_cache=False, events=None, task_metrics=None):
+    # Bounded reduce step: the task's agent condenses its output part by part until it fits in `limit`
+    # tokens. Returns the new output, or None when it already fitted
+    template = TEMPLATES["condense"]
+    model = getattr(task.agent.llm, "model", None)
+    text = task.output.raw
+    tokens = count_tokens(text, model)
+    if tokens <= limit:
+        return None
+
+    for _ in range(CONDENSE_ROUNDS):
+        if tokens <= limit:
+            break
+        part_tokens = max(min(template.brd_budget(model=model) or tokens, tokens), 1)
+        chars_per_token = len(text) / tokens
+        parts = split_chunks(text, int(part_tokens * chars_per_token) + 1)
+        logger.info("%s: condensing %d tokens in %d parts to fit %d", task.name, tokens, len(parts), limit)
+
+        def condense_part(part):
+            agent = task.agent.copy()
+            if hasattr(agent.llm, "max_tokens"):
+                agent.llm.max_tokens = max(min(limit // len(parts), template.output_tokens or limit), 1)
+            condensing = Task(
+                name=task.name,
+                description=template.description,
+                expected_output=template.expected_output,
+                agent=agent,
+            )
+            inputs = {"topic": "", "brd": part}
+            return run_task(agent, condensing, inputs, cache, bypass_cache, events, task_metrics, stream=False).raw
+
+        with ThreadPoolExecutor(max_workers=max(int(concurrency), 1)) as pool:
+            text = merge_outputs(list(pool.map(condense_part, parts)))
+        previous, tokens = tokens, count_tokens(text, model)
+        if tokens >= previous:
+            break
+
+    if tokens > limit:
+        # Last resort so the writer's prompt never overflows
+        warning = f"{task.name}: output still {tokens} tokens after condensing, cut to {limit}"
+        logger.warning(warning)
+        if events is not None:
+            events.put(("warning", task.name, warning))
+        text = text[:int(len(text) * limit / tokens)]
+
+    task.output = TaskOutput(
+        description=task.description,
+        expected_output=task.expected_output,
+        raw=text,
+        agent=task.agent.role,
+    )
+    if events is not None:
+        events.put(("done", task.name, text))
+    return task.output
+
+
+def format_locally(task, draft, events=None, task_metrics=None):
+    started = time.perf_counter()
+    try:
+        formatted = format_srs(draft)
+    except FormatError as e:
+        logger.warning("Local formatting failed, falling back to the formatter agent: %s", e)
+        return None
+
+    task.output = TaskOutput(
+        description=task.description,
+        expected_output=task.expected_output,
+        raw=formatted,
+        agent="Local formatter",
+    )
+    if task_metrics is not None:
+        metrics = TaskMetrics(task.name, "Local formatter", "local")
+        metrics.wall_time = time.perf_counter() - started
+        task_metrics.append(metrics.as_dict())
+    if events is not None:
+        events.put(("done", task.name, formatted))
+    return task.output
+
+
+def repair_srs(task, writer, document, topic, cache, bypass_cache=False, events=None, task_metrics=None):
+    # Check the final SRS locally and fix only what is wrong: BRD text that has to be verbatim is put
+    # back without a model call, and only the missing sections go back to the writer
+    missing, altered = validate_srs(task.output.raw, document.sections)
+    if not missing and not altered:
+        return task.output
+    logger.warning("SRS is missing %s and altered %s, repairing", missing or "nothing", altered or "nothing")
+
+    text = restore_verbatim(task.output.raw, document.sections, altered) if altered else task.output.raw
+    if missing:
+        template = TEMPLATES["srs_repair"]
+        agent = writer.agent.copy()
+        if template.output_tokens and hasattr(agent.llm, "max_tokens"):
+            agent.llm.max_tokens = template.output_tokens
+        repair = Task(
+            name=template.name,
+            description=template.description,
+            expected_output=template.expected_output,
+            agent=agent,
+        )
+        brd, _, _ = template.fit(f"Sections to write: {', '.join(missing)}\n\n{text}", model=getattr(agent.llm, "model", None))
+        written = run_task(agent, repair, {"topic": topic, "brd": brd}, cache, bypass_cache, events, task_metrics)
+        text = f"{text}\n\n{written.raw}"
+
+    try:
+        text = format_srs(text)
+    except FormatError:
+        pass
+    task.output = TaskOutput(
+        description=task.description,
+        expected_output=task.expected_output,
+        raw=text,
+        agent=task.output.agent,
+    )
+
+    missing, altered = validate_srs(text, document.sections)
+    for problem in [f"SRS is still missing {name}" for name in missing] + [f"SRS still alters {name}" for name in altered]:
+        logger.warning(problem)
+        if events is not None:
+            events.put(("warning", task.name, problem))
+    if events is not None:
+        events.put(("done", task.name, text))
+    return task.output
+
+
+def run_pipeline(
+    templates,
+    data,
+    filename,
+    topic,
+    cache,
+    concurrency=ANALYSIS_CONCURRENCY,
+    bypass_cache=False,
+    events=None,
+    session_id=None,
+    checkpoints=None,
+    output_path=SRS_OUTPUT_PATH,
+    revision_scope=None,
+):
+    # output_path=None skips saving the SRS, for callers that store the returned result themselves.
+    # revision_scope keeps revision history apart per user; without it uploads are matched by filename
+    started = time.perf_counter()
+    task_metrics = []
+    # A run of its own without a caller-supplied ID, so dropping its document never hits another run
+    session_id = session_id or uuid.uuid4().hex
+    try:
+        return _run_pipeline(
+            templates, data, filename, topic, cache, concurrency, bypass_cache, events, task_metrics,
+            session_id, checkpoints or {}, output_path, revision_scope,
+        )
+    finally:
+        # The writer's read tool is done with the BRD text, so free it instead of waiting for the TTL
+        DOCUMENTS.discard(session_id)
+        # Log whatever ran, including the tasks of a run that failed part way
+        write_run(filename, task_metrics, time.perf_counter() - started)
+        if events is not None:
+            events.put(("metrics", "run", json.dumps(task_metrics)))
+
+
+def _run_pipeline(
+    templates, data, filename, topic, cache, concurrency, bypass_cache, events, task_metrics, session_id,
+    checkpoints, output_path, revision_scope,
+):
+    # Extract the text and split it into sections once, instead of every agent reading the raw file
+    document = BRDocument(data, filename)
+
+    # Keep the extracted text in memory so the writer can still look up details in the full BRD
+    text_digest = DOCUMENTS.put(session_id, document.text.encode("utf-8"))
+    read_tool = DocumentReadTool(store=DOCUMENTS, session_id=session_id, digest=text_digest)
+
+    tasks = bind_templates(templates, read_tool)
+
+    # Each task only sees the BRD sections it works on, trimmed to the task's input budget
+    def inputs_for(task):
+        inputs = {"topic": topic}
+        brd = document.slice_for(task.name) if task.name in TASK_SECTIONS else ""
+        context = "\n\n".join(t.output.raw for t in task.context or [] if t.output is not None)
+        brd, _, warnings = TEMPLATES[task.name].fit(brd, context, getattr(task.agent.llm, "model", None))
+        for warning in warnings:
+            logger.warning(warning)
+            if events is not None:
+                events.put(("warning", task.name, warning))
+        if task.name in TASK_SECTIONS:
+            inputs["brd"] = brd
+        return inputs
+
+    # Tasks an earlier attempt of this run already finished are restored instead of run again
+    def restore(task):
+        raw = checkpoints.get(task.name)
+        if raw is None:
+            return None
+        task.output = TaskOutput(
+            description=task.description,
+            expected_output=task.expected_output,
+            raw=raw,
+            agent=task.agent.role,
+        )
+        if events is not None:
+            events.put(("done", task.name, raw))
+        return task.output
+
+    # Saved as soon as a task is done, so a failure later on only costs the failed task
+    def checkpoint(task):
+        if events is not None:
+            events.put(("checkpoint", task.name, task.output.raw))
+
+    # Tell what changed since the last upload under the same name by the same caller; unchanged tasks
+    # come from the cache
+    digests = document.section_digests()
+    revision = f"{revision_scope}/{filename}" if revision_scope else filename
+    previous = cache.get_revision(revision)
+    if previous is not None:
+        changed = changed_sections(previous, digests)
+        affected = affected_tasks(changed, previous, digests)
+        # Whether a task really runs again is up to the result cache; the UI reports what did
+        logger.info("%s revision changed %s, which affects %s", filename, changed or "nothing", affected or "nothing")
+        if events is not None:
+            events.put(("revision", "run", json.dumps({"changed": changed, "affected": affected})))
+
+    # An analysis whose slice does not fit its input budget is split into overlapping chunks,
+    # each extracted by its own copy of the task; the partial results are merged afterwards
+    def chunked_units(task):
+        brd = document.slice_for(task.name)
+        budget = TEMPLATES[task.name].brd_budget(model=getattr(task.agent.llm, "model", None))
+        if budget is None or budget <= 0:
+            return None
+        chunk_tokens = min(CHUNK_TOKENS or budget, budget)
+        brd_tokens = count_tokens(brd, getattr(task.agent.llm, "model", None))
+        if brd_tokens <= chunk_tokens:
+            return None
+
+        # Convert token sizes to characters with this slice's own ratio
+        chars_per_token = len(brd) / brd_tokens
+        chunks = split_chunks(brd, int(chunk_tokens * chars_per_token), int(CHUNK_OVERLAP_TOKENS * chars_per_token))
+        logger.info("%s: splitting %d BRD tokens into %d chunks", task.name, brd_tokens, len(chunks))
+        units = []
+        for chunk in chunks:
+            agent = task.agent.copy()
+            part = task.copy([agent], {})
+            # No part numbers: the input (and cache key) of a chunk must not change when a revision
+            # adds or removes chunks elsewhere in the slice
+            units.append((part, {"topic": topic, "brd": f"[Excerpt of a longer BRD]\n{chunk}"}))
+        return units
+
+    # The three analyses only read the BRD, so fan them (and their chunks) out and wait for all of them
+    analyses = [
+        task for task in (
+            tasks["business_analysis"],
+            tasks["technical_analysis"],
+            tasks["requirement_categorization"],
+        )
+        if restore(task) is None
+    ]
+    chunked = {task.name: chunked_units(task) for task in analyses}
+    with ThreadPoolExecutor(max_workers=int(concurrency)) as pool:
+        futures = {}
+        for task in analyses:
+            units = chunked[task.name] or [(task, inputs_for(task))]
+            futures[task.name] = [
+                pool.submit(
+                    run_task, part.agent, part, inputs, cache, bypass_cache, events, task_metrics,
+                    stream=not chunked[task.name],
+                )
+                for part, inputs in units
+            ]
+
+        # Checkpoint every analysis that made it before reporting the first one that did not
+        failure = None
+        for task in analyses:
+            try:
+                outputs = [future.result() for future in futures[task.name]]
+            except Exception as e:
+                failure = failure or e
+                continue
+            if chunked[task.name]:
+                task.output = TaskOutput(
+                    description=task.description,
+                    expected_output=task.expected_output,
+                    raw=merge_outputs([output.raw for output in outputs]),
+                    agent=task.agent.role,
+                )
+                if events is not None:
+                    events.put(("done", task.name, task.output.raw))
+            checkpoint(task)
+        if failure is not None:
+            raise failure
+
+    task = tasks["srs_draft"]
+    draft = restore(task)
+    if draft is None:
+        # Merged chunk results can outgrow the writer's context budget; condense them until they fit
+        shares = context_shares(task, document.slice_for(task.name))
+        for analysis in task.context or []:
+            if analysis.name in shares:
+                condensed = condense(analysis, shares[analysis.name], concurrency, cache, bypass_cache, events, task_metrics)
+                if condensed is not None:
+                    checkpoint(analysis)
+        draft = run_task(task.agent, task, inputs_for(task), cache, bypass_cache, events, task_metrics)
+        checkpoint(task)
+
+    task = tasks["srs_format"]
+    output = restore(task)
+    if output is None:
+        output = format_locally(task, draft.raw, events, task_metrics) if LOCAL_FORMATTER else None
+        if output is None:
+            output = run_task(
+                task.agent, task, inputs_for(task), cache, bypass_cache, events, task_metrics
+            )
+        output = repair_srs(
+            task, tasks["srs_draft"], document, topic, cache, bypass_cache, events, task_metrics
+        )
+        checkpoint(task)
+    if output_path:
+        write_srs(output.raw, output_path)
+
+    cache.put_revision(revision, digests)
+    return output
@@ -0,0 +1,392 @@
+import logging
+import os
+
+import litellm
+
+logger = logging.getLogger(__name__)
+
+# Instructions every task shares. They open every description, ahead of anything task specific,
+# so repeated runs send the same leading tokens and provider-side prompt caches can reuse them
+SHARED_PREFIX = (
+    "You are part of a team turning a Business Requirements Document (BRD) into a Software "
+    "Requirements Specification (SRS).\n"
+    "- Write formal, professional, client-ready English.\n"
+    "- Structure the content with Markdown headings, bullet points and tables.\n"
+    "- Never contradict the BRD, and keep its 'Out of Scope' and 'Assumptions' text as written.\n\n"
+)
+
+# Used to be repeated after nearly every bullet of the analysis and writing prompts
+ELABORATION = (
+    "Depth:\n"
+    "- Please elaborate the points properly where each point should be at least two paragraphs.\n"
+    "- Every subpoint should be explained in an elaborated manner.\n\n"
+)
+
+# Rough characters per token when litellm has no tokenizer for the model
+CHARS_PER_TOKEN = 4
+
+TRUNCATION_NOTE = "\n[... truncated to fit the prompt token budget]"
+
+
+def count_tokens(text, model=None):
+    try:
+        return litellm.token_counter(model=model or "gpt-4o", text=text)
+    except Exception:
+        return len(text) // CHARS_PER_TOKEN
+
+
+def _budget(name, kind, default):
+    # e.g. SRS_DRAFT_INPUT_TOKENS=30000; 0 turns the budget off
+    return int(os.getenv(f"{name.upper()}_{kind}_TOKENS", str(default)))
+
+
+class PromptTemplate:
+    def __init__(self, name, body, expected_output, input_heading=None, elaborate=False,
+                 input_tokens=0, output_tokens=0):
+        self.name = name
+        self.body = body
+        self.expected_output = expected_output
+        self.input_heading = input_heading
+        self.elaborate = elaborate
+        self.input_tokens = _budget(name, "INPUT", input_tokens)
+        self.output_tokens = _budget(name, "OUTPUT", output_tokens)
+
+    @property
+    def static_part(self):
+        # Everything before the per-run input, identical on every run
+        return SHARED_PREFIX + (ELABORATION if self.elaborate else "") + self.body
+
+    @property
+    def description(self):
+        # The BRD goes last so it never breaks the cacheable prefix
+        if self.input_heading is None:
+            return self.static_part
+        return f"{self.static_part}\n\n{self.input_heading}:\n{{brd}}"
+
+    def brd_budget(self, context="", model=None):
+        # Tokens left for the BRD input once the instructions and context are counted; None when unbounded
+        if not self.input_tokens:
+            return None
+        return self.input_tokens - count_tokens(self.static_part + self.expected_output + context, model)
+
+    def fit(self, brd="", context="", model=None):
+        # Returns the BRD input trimmed to the input budget, plus warnings about anything over budget
+        warnings = []
+        fixed = count_tokens(self.static_part + self.expected_output + context, model)
+        brd_tokens = count_tokens(brd, model) if brd else 0
+        total = fixed + brd_tokens
+        if not self.input_tokens or total <= self.input_tokens:
+            return brd, total, warnings
+
+        available = self.input_tokens - fixed
+        if available <= 0:
+            warnings.append(
+                f"{self.name}: instructions and context alone take {fixed} tokens, "
+                f"over the {self.input_tokens} token input budget"
+            )
+            return brd, total, warnings
+        if brd_tokens:
+            keep = int(len(brd) * available / brd_tokens)
+            warnings.append(
+                f"{self.name}: BRD input cut from {brd_tokens} to about {available} tokens "
+                f"to fit the {self.input_tokens} token input budget"
+            )
+            brd = brd[:keep] + TRUNCATION_NOTE
+        return brd, fixed + available, warnings
+
+
+BUSINESS_ANALYSIS = PromptTemplate(
+    name="business_analysis",
+    body=(
+        "Objective:\n"
+        "Extract and enhance sections from the Business Requirements Document (BRD):\n"
+        "- Introduction\n"
+        "- Purpose\n"
+        "- Scope\n"
+        "- In Scope\n"
+        "- Out of Scope\n"
+        "- Assumptions\n"
+        "- References\n"
+        "- Overview\n"
+        "Enhance extracted sections with:\n"
+        "- In-depth explanations\n"
+        "- Real-world examples\n"
+        "- Industry best practices\n"
+        "- Structured details for client clarity\n\n"
+        "Guidelines:\n"
+        "Introduction:\n"
+        "- Provide project background, business context, and purpose.\n"
+        "- Explain the need for the initiative and expected impact.\n"
+        "Purpose:\n"
+        "- Define document objectives and stakeholder guidance.\n"
+        "- Distinguish between business and technical goals.\n"
+        "Scope:\n"
+        "- Explicitly outline project boundaries.\n"
+        "- Include functional, non-functional, regulatory, and operational constraints.\n"
+        "In Scope:\n"
+        "- Detail included features, functionalities, and deliverables.\n"
+        "- Provide examples and real-world implications.\n"
+        "Out of Scope:\n"
+        "- Extract as-is without modifications.\n"
+        "- Provide context on exclusions and associated risks.\n"
+        "Assumptions:\n"
+        "- Extract as-is without modifications.\n"
+        "- Expand on implications and potential risks if assumptions change.\n"
+        "References:\n"
+        "- List cited materials, frameworks, and standards.\n"
+        "- Enhance with best practices and industry standards.\n"
+        "Overview:\n"
+        "- Summarize key takeaways in a structured format.\n\n"
+        "Enhancements:\n"
+        "- Ensure structured, professional, and detailed writing.\n"
+        "- Use tables, bullet points, and subheadings for clarity.\n"
+        "- Include industry-specific examples and real-world cases.\n"
+        "- Validate and enrich sections using external sources.\n\n"
+        "Output:\n"
+        "- Formal, structured, and client-ready document.\n"
+        "- Include tables, and figures where necessary.\n"
+        "- Maintain clarity, completeness, and professionalism."
+    ),
+    expected_output=(
+        "Clear and detailed sections for Introduction, Purpose, Scope, In Scope, Out of Scope, Assumptions, References, and Overview with enhanced explanations where needed."
+    ),
+    input_heading="BRD excerpt",
+    elaborate=True,
+    input_tokens=8000,
+    output_tokens=4000,
+)
+
+TECHNICAL_ANALYSIS = PromptTemplate(
+    name="technical_analysis",
+    body=(
+        "Objective:\n"
+        "Extract and enhance sections from the Business Requirements Document (BRD):\n"
+        "- Data Model\n"
+        "- User Characteristics\n"
+        "- Codification Schemes\n"
+        "- Dependencies\n"
+        "Enhance extracted sections with:\n"
+        "- In-depth explanations\n"
+        "- Real-world examples\n"
+        "- Industry best practices\n"
+        "- Structured details for client clarity\n\n"
+        "Guidelines:\n"
+        "Data Model:\n"
+        "- Extract existing model details and expand into a structured ER model.\n"
+        "- Include entities, attributes, primary keys, foreign keys, and relationships.\n"
+        "- Provide example schemas, sample data representations, and normalization best practices.\n"
+        "- Use industry standards and tables where necessary.\n"
+        "- No images or tables required\n"
+        "User Characteristics:\n"
+        "- Identify and categorize user roles, personas, and access levels.\n"
+        "- Include demographics, skill levels, and behavioral patterns.\n"
+        "- Provide user journeys, workflows, and interaction models.\n"
+        "- Incorporate UX/UI principles and accessibility considerations.\n"
+        "- No images or tables required\n"
+        "Codification Schemes:\n"
+        "- Extract existing schemes and document naming conventions.\n"
+        "- Detail numbering systems, data classification rules, and coding structures.\n"
+        "- Include examples of versioning strategies and hierarchical naming methods.\n"
+        "- Align with industry standards (ISO, IEEE, enterprise policies).\n"
+        "Dependencies:\n"
+        "- Identify internal and external dependencies affecting the system.\n"
+        "- List third-party services, APIs, databases, regulatory constraints, and interdependencies.\n"
+        "- Expand on bottlenecks, failure points, and contingency planning.\n"
+        "- Provide risk assessments, mitigation strategies, and alternate solutions.\n\n"
+        "Enhancements:\n"
+        "- Validate vague sections using LLM and external industry sources.\n"
+        "- Provide case studies, benchmarks, and best practices for enrichment.\n"
+        "- Use tables, structured lists, flowcharts, and for clarity.\n"
+        "- Maintain a structured, professional, and client-ready format.\n\n"
+        "Output:\n"
+        "- Highly detailed, structured, and professional document.\n"
+        "- Include technical explanations, tables elements, and best practices.\n"
+        "- Ensure exhaustive details for clarity and completeness."
+    ),
+    expected_output=(
+        "Clear and detailed technical sections for Data Model, User Characteristics, Codification Schemes, Assumptions, Dependencies, and Out of Scope."
+    ),
+    input_heading="BRD excerpt",
+    elaborate=True,
+    input_tokens=8000,
+    output_tokens=4000,
+)
+
+REQUIREMENT_CATEGORIZATION = PromptTemplate(
+    name="requirement_categorization",
+    body=(
+        "Objective:\n"
+        "Extract and categorize business requirements from the Business Requirements Document (BRD) into:\n"
+        "- Functional Requirements (FR)\n"
+        "- Non-Functional Requirements (NFR)\n"
+        "- Technical Requirements (TR)\n"
+        "Enhance extracted requirements by:\n"
+        "- Refining vague or unclear sections using LLM and external knowledge sources.\n"
+        "- Providing detailed, structured, and client-ready documentation.\n\n"
+        "Categorization Guidelines:\n"
+        "Functional Requirements (FR):\n"
+        "- Define core system features, operations, and expected behaviors.\n"
+        "- Outline system responses to user actions.\n"
+        "- Provide detailed use cases, workflows, and real-world examples.\n"
+        "- Ensure all functionalities are measurable and verifiable.\n"
+        "Non-Functional Requirements (NFR):\n"
+        "- Define quality attributes, performance, security, scalability, and compliance needs.\n"
+        "- Ensure all NFRs are quantifiable and testable (e.g., 'system must handle 1,000 transactions per second with 99.99% uptime').\n"
+        "- Align with industry benchmarks and best practices.\n"
+        "Technical Requirements (TR):\n"
+        "- Extract infrastructure, technology stack, APIs, frameworks, and database structures.\n"
+        "- Detail hardware/software constraints, networking requirements, and security protocols.\n"
+        "- List third-party dependencies and integration requirements.\n"
+        "- Enhance with best practices and current industry standards.\n\n"
+        "Enhancements:\n"
+        "- Identify and refine vague or ambiguous requirements.\n"
+        "- Align with industry compliance and security standards.\n"
+        "- Use tables, and structured lists for better clarity.\n"
+        "- Ensure a structured, professional, and client-focused format.\n\n"
+        "Output:\n"
+        "- Well-structured, detailed, and categorized document.\n"
+        "- Clear separation of Functional, Non-Functional, and Technical requirements.\n"
+        "- Use of tables, bullet points, and tables elements for improved comprehension.\n"
+        "- Comprehensive details ensuring no ambiguity in requirements."
+    ),
+    expected_output=(
+        "A structured list of Functional, Non-Functional, and Technical requirements with well-explained descriptions."
+    ),
+    input_heading="BRD excerpt",
+    input_tokens=12000,
+    output_tokens=4000,
+)
+
+SRS_DRAFT = PromptTemplate(
+    name="srs_draft",
+    body=(
+        "Objective:\n"
+        "Generate a highly detailed, structured, and professional Software Requirements Specification (SRS) document by consolidating and expanding researched content.\n"
+        "Ensure clarity, completeness, and technical accuracy while preserving extracted content where required.\n\n"
+        "Guidelines:\n"
+        "Preserve Extracted Content:\n"
+        "- 'Out of Scope' and 'Assumptions' sections must be included exactly as extracted from the BRD without modification.\n"
+        "- Expand all other sections with additional details but without altering the original intent.\n"
+        "Sections to Include:\n"
+        "- Introduction:\n"
+        "  - Provide a project background, business context, and overall purpose.\n"
+        "  - Include industry-specific context and real-world significance.\n"
+        "- Purpose:\n"
+        "  - Define the role of this document in guiding stakeholders.\n"
+        "  - Clearly differentiate between business and technical objectives.\n"
+        "- Scope:\n"
+        "  - Outline explicit project boundaries, covering functional, non-functional, regulatory, and operational aspects.\n"
+        "- In Scope:\n"
+        "  - Break down included functionalities, features, and deliverables.\n"
+        "  - Provide detailed descriptions, examples, and their business impact.\n"
+        "- Out of Scope:\n"
+        "  - Insert as-is from the BRD without modification.\n"
+        "  - Provide additional context on exclusions and associated risks.\n"
+        "- Assumptions:\n"
+        "  - Insert as-is from the BRD without modification.\n"
+        "  - Elaborate on implications and possible risks if assumptions change.\n"
+        "- References:\n"
+        "  - List cited materials, standards, frameworks, and relevant documentation.\n"
+        "  - Add supporting industry best practices where applicable.\n"
+        "- Overview:\n"
+        "  - Summarize key takeaways in a structured, digestible format.\n"
+        "- Dependencies:\n"
+        "  - Point out dependencies on third-party APIs, databases, hardware constraints, and system integrations.\n"
+        "- Conclusion:\n"
+        "  - Summarize the key insights of the document.\n"
+        "Requirement Categorization:\n"
+        "- Functional Requirements (FR):\n"
+        "  - Define core system features, workflows, and expected behaviors.\n"
+        "  - Provide detailed use cases, user interactions, and real-world applications.\n"
+        "- Non-Functional Requirements (NFR):\n"
+        "  - Outline performance expectations, security requirements, compliance standards, scalability, and operational constraints.\n"
+        "  - Ensure quantifiable and testable criteria.\n"
+        "- Technical Requirements (TR):\n"
+        "  - Detail system architecture, technology stack, APIs, databases, integrations, hardware/software constraints, and security protocols.\n"
+        "Technical Analysis & Data Representation:\n"
+        "- Data Model:\n"
+        "  - Expand with entity-relationship, database schemas, attribute definitions, and data flow explanations.\n"
+        "  - Include normalization and optimization principles.\n"
+        "- User Characteristics:\n"
+        "  - Define user personas, roles, access levels, demographics, behavior patterns, and usability needs.\n"
+        "  - Incorporate UX/UI principles for better accessibility.\n"
+        "- Codification Schemes:\n"
+        "  - Provide structured naming conventions, numbering systems, data classification rules, and version control strategies.\n"
+        "  - Align with industry standards.\n"
+        "Enhancements Using External Research & Best Practices:\n"
+        "- Refine vague sections using LLM capabilities and external industry research to ensure clarity and completeness.\n"
+        "- Incorporate real-world case studies, frameworks, standards, and benchmarks.\n"
+        "- Utilize tables, flowcharts, and structured lists to enhance readability.\n"
+        "- Maintain a formal, professional, and highly structured format suitable for clients and stakeholders.\n"
+        "Output Requirements:\n"
+        "- The final SRS document must be highly detailed, structured, and exhaustive.\n"
+        "- Information should be well-organized and fully explained without ambiguity.\n"
+        "- No modification should be made to sections explicitly required to remain unchanged.\n"
+        "- The document must be formatted professionally, using clear headings, tables, and bullet points for readability.\n"
+        "- Start every top-level section with a Markdown '## ' heading named after the section."
+    ),
+    expected_output=(
+        "A fully written, structured, and polished SRS document incorporating all extracted and categorized information, ensuring that Out of Scope and Assumptions match the BRD and along with it every part must be defined in an elaborated manner."
+    ),
+    input_heading="BRD sections to include verbatim",
+    elaborate=True,
+    input_tokens=24000,
+    output_tokens=8000,
+)
+
+SRS_FORMAT = PromptTemplate(
+    name="srs_format",
+    body=(
+        "Format the final SRS document with appropriate headings, line breaks, and structured sections.\n"
+        "Ensure that the 'Out of Scope' section is correctly placed after 'In Scope'.\n"
+        "Ensure that 'Assumptions' is correctly formatted with bullet points and listed before 'Dependencies'."
+    ),
+    expected_output=(
+        "The final SRS document is properly formatted with bolded, capitalized headings, clear section divisions, and includes 'Out of Scope,' 'Assumptions,' 'Dependencies,' and 'Conclusion' sections."
+    ),
+    input_tokens=24000,
+    output_tokens=8000,
+)
+
+CONDENSE = PromptTemplate(
+    name="condense",
+    body=(
+        "The analysis below was put together from several parts of a long BRD and is too long for the next step.\n"
+        "Condense it into one shorter document that keeps its section headings.\n"
+        "- Keep every distinct requirement, fact, figure, name and constraint.\n"
+        "- Drop repetition, filler and generic explanations.\n"
+        "- Keep 'Out of Scope' and 'Assumptions' text word for word."
+    ),
+    expected_output=(
+        "The same analysis, shorter, under the same '## ' section headings, with no distinct point lost."
+    ),
+    input_heading="Analysis to condense",
+    input_tokens=24000,
+    output_tokens=4000,
+)
+
+SRS_REPAIR = PromptTemplate(
+    name="srs_repair",
+    body=(
+        "The SRS document below is missing some required sections.\n"
+        "Write only the missing sections listed with the input, consistent with the rest of the document.\n"
+        "Start each section with a Markdown '## ' heading carrying the section name and do not repeat any other section."
+    ),
+    expected_output=(
+        "Only the requested SRS sections, each under its own '## ' heading."
+    ),
+    input_heading="Sections to write and the current SRS",
+    elaborate=True,
+    input_tokens=24000,
+    output_tokens=4000,
+)
+
+TEMPLATES = {
+    BUSINESS_ANALYSIS.name: BUSINESS_ANALYSIS,
+    TECHNICAL_ANALYSIS.name: TECHNICAL_ANALYSIS,
+    REQUIREMENT_CATEGORIZATION.name: REQUIREMENT_CATEGORIZATION,
+    SRS_DRAFT.name: SRS_DRAFT,
+    SRS_FORMAT.name: SRS_FORMAT,
+    CONDENSE.name: CONDENSE,
+    SRS_REPAIR.name: SRS_REPAIR,
+}
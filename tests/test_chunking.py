@@ -0,0 +1,48 @@
+from chunking import merge_outputs, split_chunks
+
+
+def test_split_chunks_respects_size_and_keeps_every_line():
+    text = "\n".join(f"Line {number} of the requirements." for number in range(200))
+    chunks = split_chunks(text, 500)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert {line for chunk in chunks for line in chunk.splitlines()} == set(text.splitlines())
+
+
+def test_split_chunks_repeats_the_heading_it_continues():
+    text = "## Data Model\n" + "\n".join(f"- Entity {number}" for number in range(100))
+    chunks = split_chunks(text, 300, overlap=40)
+    assert len(chunks) > 1
+    assert all(chunk.startswith("## Data Model") for chunk in chunks)
+
+
+def test_split_chunks_short_text_is_one_chunk():
+    assert split_chunks("## Scope\nEverything.", 500) == ["## Scope\nEverything."]
+
+
+def test_merge_outputs_of_single_section_chunks():
+    merged = merge_outputs([
+        "## Data Model\n### Entities\n- Order\n- Customer\n### Relationships\n- Order belongs to Customer",
+        "## Data Model\n### Entities\n- Order\n- Product\n### Keys\n- order_id",
+    ])
+    assert merged == (
+        "## Data Model\n\n"
+        "### Entities\n\n- Order\n- Customer\n- Product\n\n"
+        "### Relationships\n\n- Order belongs to Customer\n\n"
+        "### Keys\n\n- order_id"
+    )
+
+
+def test_merge_outputs_drops_document_title_and_repeated_paragraphs():
+    merged = merge_outputs([
+        "# Business Analysis\n## Scope\nThe portal.\n## Assumptions\n- Users have accounts",
+        "## Assumptions\n- Users have accounts\n- Network is available\n## Scope\nThe portal.",
+    ])
+    assert merged == "## Scope\n\nThe portal.\n\n## Assumptions\n\n- Users have accounts\n- Network is available"
+
+
+def test_split_chunks_keeps_unedited_chunks_after_an_insert():
+    lines = ["## Data Model"] + [f"- Entity {number} has attributes {number * 7} and {number * 13}" for number in range(400)]
+    before = split_chunks("\n".join(lines), 3000, overlap=300)
+    after = split_chunks("\n".join(lines[:5] + ["- " + "new requirement " * 20] + lines[5:]), 3000, overlap=300)
+    assert len(set(before) - set(after)) <= 2
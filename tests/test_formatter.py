@@ -0,0 +1,45 @@
+from formatter import restore_verbatim, validate_srs
+
+BRD = {"Out of Scope": "1. Mobile app\n2. Single sign-on", "Assumptions": "Users have accounts."}
+
+IEEE_DRAFT = (
+    "# SRS\n"
+    "## 1. Introduction\n"
+    "Intro.\n"
+    "### 1.1 Purpose\n"
+    "Purpose.\n"
+    "## 2. Scope\n"
+    "### 2.1 In Scope\n"
+    "Web portal.\n"
+    "### 2.2 Out of Scope\n"
+    "1. Mobile app\n"
+    "2. Single sign-on\n"
+    "## 3. Assumptions\n"
+    "- Users have accounts.\n"
+    "## 4. Dependencies\n"
+    "Payment API.\n"
+    "## 5. Conclusion\n"
+    "Done.\n"
+)
+
+
+def test_nested_sections_count_as_present():
+    assert validate_srs(IEEE_DRAFT, BRD) == ([], [])
+
+
+def test_altered_nested_section_is_restored_in_place():
+    draft = IEEE_DRAFT.replace("1. Mobile app\n", "1. Mobile application\n")
+    assert validate_srs(draft, BRD) == ([], ["Out of Scope"])
+
+    restored = restore_verbatim(draft, BRD, ["Out of Scope"])
+    assert validate_srs(restored, BRD) == ([], [])
+    assert restored.count("Out of Scope") == 1
+    assert restored.index("### 2.2 Out of Scope") < restored.index("## 3. Assumptions")
+
+
+def test_missing_verbatim_section_goes_next_to_its_neighbour():
+    draft = IEEE_DRAFT.replace("### 2.2 Out of Scope\n1. Mobile app\n2. Single sign-on\n", "")
+    restored = restore_verbatim(draft, BRD, ["Out of Scope"])
+    assert "### Out of Scope" in restored
+    assert restored.index("### Out of Scope") < restored.index("## 3. Assumptions")
+    assert validate_srs(restored, BRD) == ([], [])
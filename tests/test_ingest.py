@@ -0,0 +1,72 @@
+from ingest import affected_tasks, split_sections
+
+
+def test_numbered_list_stays_inside_numbered_section():
+    sections = split_sections(
+        "1. Introduction\n"
+        "Intro text.\n"
+        "2. Out of Scope\n"
+        "1. Mobile app support\n"
+        "2. Single sign-on\n"
+        "3. Offline mode\n"
+        "3. Assumptions\n"
+        "Users have accounts.\n"
+    )
+    assert list(sections) == ["Introduction", "Out of Scope", "Assumptions"]
+    assert sections["Out of Scope"] == "1. Mobile app support\n2. Single sign-on\n3. Offline mode"
+
+
+def test_numbered_list_under_markdown_heading():
+    sections = split_sections("## Out of Scope\n1. Mobile app support\n2. Single sign-on\n## Assumptions\nNone.")
+    assert sections["Out of Scope"] == "1. Mobile app support\n2. Single sign-on"
+    assert sections["Assumptions"] == "None."
+
+
+def test_bulleted_list_inside_section():
+    sections = split_sections("Assumptions\n- Users have accounts\n* Network is available\n\nDependencies\n- Payment API")
+    assert sections["Assumptions"] == "- Users have accounts\n* Network is available"
+    assert sections["Dependencies"] == "- Payment API"
+
+
+def test_unknown_numbered_headings_follow_top_level_sequence():
+    sections = split_sections(
+        "1. Project Charter\n"
+        "Charter text.\n"
+        "2. Governance\n"
+        "Board.\n"
+        "2.1 Roles\n"
+        "Owner.\n"
+        "3. Budget Plan\n"
+        "Numbers.\n"
+    )
+    assert list(sections) == ["Project Charter", "Governance", "Budget Plan"]
+    assert sections["Governance"] == "Board.\n2.1 Roles\nOwner."
+
+
+def test_list_continuation_is_not_a_heading():
+    sections = split_sections(
+        "1. Introduction\n"
+        "Text.\n"
+        "2. Out of Scope\n"
+        "1. Mobile app\n"
+        "2. Kiosk mode\n"
+        "3. Offline sync\n"
+    )
+    assert list(sections) == ["Introduction", "Out of Scope"]
+    assert sections["Out of Scope"].splitlines() == ["1. Mobile app", "2. Kiosk mode", "3. Offline sync"]
+
+
+def test_change_reruns_tasks_that_read_the_whole_document():
+    # No technical section in either revision, so the technical analysis read the whole BRD
+    previous = {"Introduction": "a", "Assumptions": "b"}
+    current = {"Introduction": "a", "Assumptions": "c"}
+    assert affected_tasks(["Assumptions"], previous, current) == [
+        "business_analysis", "technical_analysis", "requirement_categorization", "srs_draft", "srs_format",
+    ]
+
+
+def test_change_skips_tasks_whose_sections_are_unchanged():
+    previous = {"Introduction": "a", "Data Model": "b", "Requirements": "c"}
+    current = {"Introduction": "x", "Data Model": "b", "Requirements": "c"}
+    assert affected_tasks(["Introduction"], previous, current) == ["business_analysis", "srs_draft", "srs_format"]
+    assert affected_tasks([], previous, previous) == []
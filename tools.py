@@ -0,0 +1,42 @@
+from typing import Any, Optional, Type
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field
+
+
+class DocumentReadToolSchema(BaseModel):
+    start_line: Optional[int] = Field(None, description="First line to read, starting at 1. Omit to read from the top.")
+    line_count: Optional[int] = Field(None, description="Number of lines to read. Omit to read to the end.")
+
+
+class DocumentReadTool(BaseTool):
+    name: str = "Read the BRD"
+    description: str = (
+        "Reads the text of the business requirements document being converted. "
+        "Pass start_line and line_count to read only part of it."
+    )
+    args_schema: Type[BaseModel] = DocumentReadToolSchema
+    store: Any
+    session_id: str
+    digest: str
+
+    def _run(self, start_line: Optional[int] = None, line_count: Optional[int] = None, **kwargs: Any) -> str:
+        buffer = self.store.get(self.session_id, self.digest)
+        if buffer is None:
+            return "Error: The document is no longer available."
+
+        # Find the byte range in place so only the requested lines are copied out of the buffer
+        start = 0
+        for _ in range(max((start_line or 1) - 1, 0)):
+            start = buffer.find(b"\n", start) + 1
+            if start == 0:
+                return ""
+        end = len(buffer)
+        if line_count is not None:
+            end = start
+            for _ in range(max(line_count, 0)):
+                end = buffer.find(b"\n", end) + 1
+                if end == 0:
+                    end = len(buffer)
+                    break
+        return buffer[start:end].decode("utf-8", errors="replace")